@@ -1,31 +1,41 @@
-from .client import Observation, observe, provide, use
-from .evaluation import Hook, hook, mock
+from .client import Observation, TraceStore, observe, provide, use
+from .evaluation import AsyncHook, Hook, hook, mock
 from .inference import (
     Message,
+    MessagePrefix,
     Model,
     ModelProvider,
     assistant_message,
     generate_object,
     generate_text,
     image_content,
+    stream_object,
+    stream_text,
     system_message,
     user_message,
 )
+from .scheduling import Priority
 
 __all__ = [
     "use",
     "observe",
     "Observation",
+    "TraceStore",
     "provide",
     "Model",
     "ModelProvider",
     "generate_object",
     "generate_text",
+    "stream_text",
+    "stream_object",
+    "Priority",
     "Message",
+    "MessagePrefix",
     "system_message",
     "user_message",
     "assistant_message",
     "image_content",
+    "AsyncHook",
     "Hook",
     "hook",
     "mock",
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from itertools import count
+from typing import TYPE_CHECKING, Any, Literal
+
+if TYPE_CHECKING:
+    from agentlens.inference import Message, ModelProvider
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 1000
+DEFAULT_MAX_WAIT_SECONDS = 60.0
+DEFAULT_POLL_INTERVAL_SECONDS = 30.0
+
+_request_ids = count(1)
+
+
+@dataclass
+class BatchRequest:
+    """A single inference call queued for a provider batch job"""
+
+    kind: Literal["generate_text", "generate_object"]
+    model: str
+    messages: list[Message]
+    params: dict[str, Any] = field(default_factory=dict)
+    custom_id: str = field(default_factory=lambda: f"req-{next(_request_ids)}")
+
+
+class BatchError(Exception):
+    """Raised to callers whose request failed or went missing from a batch"""
+
+    pass
+
+
+@dataclass
+class _Pending:
+    request: BatchRequest
+    future: asyncio.Future[Any]
+
+
+class BatchMode:
+    """Routes inference calls through provider batch APIs, provided as a context
+
+    Calls made within `provide(BatchMode())` are queued per provider and model instead
+    of being sent interactively. A queue is submitted as one batch job once it holds
+    `max_batch_size` requests or `max_wait` seconds after its first request, then
+    polled every `poll_interval` seconds; each caller resolves with its own result.
+    Providers opt in by implementing `submit_batch` and `poll_batch`.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT_SECONDS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.submitted_batches = 0
+        self._queues: dict[tuple[ModelProvider, str], list[_Pending]] = {}
+        self._timers: dict[tuple[ModelProvider, str], asyncio.TimerHandle] = {}
+        self._jobs: set[asyncio.Task[None]] = set()
+
+    async def submit(self, provider: ModelProvider, request: BatchRequest) -> Any:
+        """Queue a request and wait for its result"""
+        loop = asyncio.get_running_loop()
+        key = (provider, request.model)
+        pending = _Pending(request, loop.create_future())
+        queue = self._queues.setdefault(key, [])
+        queue.append(pending)
+
+        if len(queue) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return await pending.future
+
+    def flush(self) -> None:
+        """Submit every queued request now instead of waiting for the window"""
+        for key in list(self._queues):
+            self._flush(key)
+
+    async def drain(self) -> None:
+        """Flush and wait for every submitted batch to finish"""
+        self.flush()
+        while self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    def _flush(self, key: tuple[ModelProvider, str]) -> None:
+        if (timer := self._timers.pop(key, None)) is not None:
+            timer.cancel()
+        queue = self._queues.pop(key, None)
+        if not queue:
+            return
+        job = asyncio.ensure_future(self._run(key[0], queue))
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _run(self, provider: ModelProvider, batch: list[_Pending]) -> None:
+        live = [p for p in batch if not p.future.done()]
+        if not live:
+            return
+        try:
+            batch_id = await provider.submit_batch([p.request for p in live])
+            self.submitted_batches += 1
+            while (results := await provider.poll_batch(batch_id)) is None:
+                await asyncio.sleep(self.poll_interval)
+        except Exception as e:
+            logger.debug(f"Batch of {len(live)} requests failed: {e}")
+            for pending in live:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        for pending in live:
+            if pending.future.done():
+                continue  # the caller was cancelled while the batch ran
+            result = results.get(pending.request.custom_id, _MISSING)
+            if result is _MISSING:
+                pending.future.set_exception(
+                    BatchError(
+                        f"Batch {batch_id} returned no result for {pending.request.custom_id}"
+                    )
+                )
+            elif isinstance(result, BaseException):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+
+
+_MISSING = object()
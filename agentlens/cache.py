@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Sequence, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+DEFAULT_MEMORY_ENTRIES = 1024
+DEFAULT_DISK_ENTRIES = 100_000
+TOUCH_BATCH_SIZE = 256
+
+
+def request_fingerprint(kind: str, model: str, messages: Sequence[BaseModel], **params: Any) -> str:
+    """Stable content hash of an inference request"""
+    schema = params.pop("schema", None)
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        schema = schema.model_json_schema()
+    # a shared MessagePrefix is hashed once, not re-serialized for every call
+    prefix = getattr(messages, "prefix", None)
+    if prefix is not None:
+        messages = messages[len(prefix) :]
+    payload = {
+        "kind": kind,
+        "model": model,
+        "messages": [message.model_dump(mode="json") for message in messages],
+        "schema": schema,
+        "params": params,
+    }
+    if prefix is not None:
+        payload["prefix"] = prefix.fingerprint
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache of serialized inference responses, provided as a context
+
+    Entries live in an in-memory LRU of `max_memory_entries` and, when `path` is set,
+    in a SQLite file that keeps at most `max_disk_entries` (least recently used are
+    evicted first). Entries older than `ttl` seconds are treated as misses.
+
+    Disk hits do not write: their access times are buffered and saved in batches of
+    `TOUCH_BATCH_SIZE`, alongside the next `set`, or on `close()`. The file is in WAL
+    mode with `synchronous=NORMAL`, so committing a `set` does not wait on an fsync.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        ttl: float | None = None,
+        max_memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+        max_disk_entries: int = DEFAULT_DISK_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._disk_entries = 0
+        self._touched: dict[str, float] = {}  # key -> access time not yet saved
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+            self._db.commit()
+            self._disk_entries = self._count_disk_entries()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    self._touched[key] = now
+                    if len(self._touched) >= TOUCH_BATCH_SIZE:
+                        self._save_touches()
+                        self._db.commit()
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is None:
+                return
+            self._touched.pop(key, None)
+            self._save_touches()  # before evicting, which goes by access time
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, value, now, now)
+            )
+            self._disk_entries += 1
+            # evict in batches once the table overshoots its bound by 10%
+            if self._disk_entries > self.max_disk_entries * 1.1:
+                if self.ttl is not None:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+                    )
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._disk_entries = self._count_disk_entries()
+            self._db.commit()
+
+    def _save_touches(self) -> None:
+        assert self._db is not None
+        if self._touched:
+            self._db.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _count_disk_entries(self) -> int:
+        assert self._db is not None
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._save_touches()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future[Any]):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent identical inference requests, provided as a context
+
+    The first caller for a fingerprint starts the request as a separate task and later
+    callers await the same result (or exception) instead of sending a duplicate. A
+    cancelled caller only detaches itself; the shared request is cancelled once every
+    caller waiting on it has been cancelled.
+    """
+
+    def __init__(self) -> None:
+        self.coalesced = 0
+        self._flights: dict[str, _Flight] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: str, call: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Await `call()` or an identical call already in flight, and whether it was shared"""
+        flight = self._flights.get(key)
+        coalesced = flight is not None
+        if flight is None:
+            flight = self._start(key, call)
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if not flight.task.done() and flight.waiters == 0:
+                flight.task.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            raise
+        flight.waiters -= 1
+        return result, coalesced
+
+    def _start(self, key: str, call: Callable[[], Awaitable[T]]) -> _Flight:
+        flight = _Flight(asyncio.ensure_future(call()))
+
+        def forget(task: asyncio.Future[Any]) -> None:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if not task.cancelled():
+                task.exception()  # consumed by the waiters; silences "never retrieved"
+
+        flight.task.add_done_callback(forget)
+        self._flights[key] = flight
+        return flight
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Literal
+from weakref import finalize
+
+from pydantic import BaseModel
+
+from agentlens.evaluation import MockMiss
+
+logger = logging.getLogger(__name__)
+
+CassetteMode = Literal["record", "replay", "auto"]
+COMMIT_BATCH_SIZE = 64
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    raise TypeError(f"{type(value).__name__} has no stable encoding")
+
+
+def call_key(
+    fn: Callable[..., Any],
+    inputs: dict[str, Any],
+    encode: Callable[[Any], Any] | None = None,
+) -> str | None:
+    """Stable key of a call from its bound inputs, or None if they cannot be encoded
+
+    `encode` may return a stand-in for values that are not plain JSON, or NotImplemented
+    to fall back to the built-in encodings.
+    """
+    default = _encode_default
+    if encode is not None:
+
+        def default(value: Any) -> Any:
+            encoded = encode(value)
+            return _encode_default(value) if encoded is NotImplemented else encoded
+
+    try:
+        encoded = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=default)
+    except (TypeError, ValueError):
+        return None
+    digest = hashlib.sha256(encoded.encode()).hexdigest()
+    return f"{fn.__module__}.{fn.__qualname__}:{digest}"
+
+
+class Cassette:
+    """Records observed calls and model responses to disk and replays them, provided as a context
+
+    Within `provide(Cassette(path))`, every observed task whose inputs have a stable
+    encoding (JSON values, Pydantic models, dataclasses) and every provider
+    `generate_*` request is keyed by its inputs. In `record` mode calls run live and
+    their results are written to the cassette, a SQLite file of compressed pickles. In
+    `replay` mode recorded results are served like mocks without running the call,
+    while unseen inputs fall through (`MockMiss`) to live execution. `auto` replays what
+    it can and records the rest.
+
+    Recordings are committed in batches of `COMMIT_BATCH_SIZE`, on `flush()` and on
+    `close()`; the file is in WAL mode with `synchronous=NORMAL`, so a commit does not
+    wait on an fsync. Close the cassette, e.g. with a `with` block, before reading
+    the file elsewhere; pending recordings are also committed when it is garbage
+    collected or the interpreter exits.
+    """
+
+    def __init__(self, path: str | Path, mode: CassetteMode = "auto"):
+        if mode not in ("record", "replay", "auto"):
+            raise ValueError(f"Invalid cassette mode: {mode}")
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._pending = 0  # recorded calls not yet committed
+        self._db: sqlite3.Connection | None = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS calls (key TEXT PRIMARY KEY, result BLOB NOT NULL)"
+        )
+        self._db.commit()
+        # a cassette dropped without being closed still keeps what it recorded
+        self._finalizer = finalize(self, self._db.commit)
+
+    def replay(self, key: str) -> Any:
+        """The recorded result for `key`, raising MockMiss if there is none to serve"""
+        if self.mode == "record" or self._db is None:
+            raise MockMiss(key)
+        with self._lock:
+            row = self._db.execute("SELECT result FROM calls WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            raise MockMiss(key)
+        self.hits += 1
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def record(self, key: str, result: Any) -> None:
+        if self.mode == "replay" or self._db is None:
+            return
+        try:
+            blob = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.debug(f"Not recording {key}: {e}")
+            return
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO calls VALUES (?, ?)", (key, blob))
+            self._pending += 1
+            if self._pending >= COMMIT_BATCH_SIZE:
+                self._commit()
+        self.recorded += 1
+
+    def flush(self) -> None:
+        """Commit every call recorded so far"""
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+
+    def _commit(self) -> None:
+        assert self._db is not None
+        self._db.commit()
+        self._pending = 0
+
+    def __enter__(self) -> Cassette:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._finalizer.detach()
+                self._commit()
+                self._db.close()
+                self._db = None
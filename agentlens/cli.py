@@ -1,34 +1,58 @@
 import asyncio
+import json
 import sys
 import traceback
-from importlib import import_module
 from pathlib import Path
+from typing import Optional
 
 import typer
 from typing_extensions import Annotated
 
+from agentlens.runner import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_WORKERS,
+    ItemResult,
+    load_dataset,
+    load_module,
+    run_dataset,
+)
+
 app = typer.Typer()
 run_app = typer.Typer()
 app.add_typer(run_app, name="run")
 
 
-@run_app.callback(invoke_without_command=True)
+@run_app.callback(invoke_without_command=True, context_settings={"allow_interspersed_args": True})
 def run(
     file_path: Annotated[str, typer.Argument(help="Path to the Python file to run")],
     function_name: Annotated[str, typer.Argument(help="Name of the function to run")],
+    dataset: Annotated[
+        Optional[Path],
+        typer.Option(help="JSON or JSON Lines file of inputs to run the function over"),
+    ] = None,
+    workers: Annotated[
+        int, typer.Option(help="Worker processes to shard the dataset across")
+    ] = DEFAULT_WORKERS,
+    concurrency: Annotated[
+        int, typer.Option(help="Items in flight per worker")
+    ] = DEFAULT_CONCURRENCY,
+    hook: Annotated[
+        list[str], typer.Option(help="Hook to provide in each worker, as name or module:name")
+    ] = [],
+    mock: Annotated[
+        list[str], typer.Option(help="Mock to provide in each worker, as name or module:name")
+    ] = [],
+    report: Annotated[
+        Optional[Path], typer.Option(help="Write the merged run report to this JSON file")
+    ] = None,
 ):
     """Run a Python function with AgentLens console visualization"""
-    try:
-        # Convert file path to module path
-        path = Path(file_path)
-        if not path.suffix == ".py":
-            raise ValueError("File must be a Python file")
+    if dataset is not None:
+        _run_dataset(file_path, function_name, dataset, workers, concurrency, hook, mock, report)
+        return
 
-        # Convert path/to/file.py to path.to.file
-        module_path = str(path.with_suffix("")).replace("/", ".").replace("\\", ".")
-
-        # Import the module
-        module = import_module(module_path)
+    try:
+        module = load_module(file_path)
 
         # Get the function
         func = module.__dict__.get(function_name)
@@ -56,5 +80,47 @@ def run(
         raise typer.Exit(1)
 
 
+def _run_dataset(
+    file_path: str,
+    function_name: str,
+    dataset: Path,
+    workers: int,
+    concurrency: int,
+    hooks: list[str],
+    mocks: list[str],
+    report_path: Path | None,
+) -> None:
+    def on_result(result: ItemResult) -> None:
+        status = "error" if result.error is not None else "ok"
+        duration_ms = result.duration_ns / 1e6
+        typer.echo(f"[{result.index}] {status} in {duration_ms:.1f}ms (worker {result.worker})")
+
+    try:
+        inputs = load_dataset(dataset)
+        report = run_dataset(
+            file_path,
+            function_name,
+            inputs,
+            workers=workers,
+            concurrency=concurrency,
+            hooks=hooks,
+            mocks=mocks,
+            on_result=on_result,
+        )
+    except Exception:
+        traceback.print_exc()
+        raise typer.Exit(1)
+
+    summary = report.summary()
+    typer.echo(
+        f"\n{summary['items']} items, {summary['errors']} errors on {summary['workers']} workers "
+        f"in {summary['wall_time_ns'] / 1e9:.2f}s"
+    )
+    if report_path is not None:
+        report_path.write_text(json.dumps(report.to_dict(), indent=2))
+    if report.errors:
+        raise typer.Exit(1)
+
+
 if __name__ == "__main__":
     app()
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+from collections import deque
 from contextlib import contextmanager
-from dataclasses import dataclass
+from contextvars import ContextVar
 from datetime import datetime
-from functools import wraps
+from functools import partial, wraps
+from inspect import BoundArguments, Parameter, Signature, signature
+from itertools import count
 from typing import (
+    TYPE_CHECKING,
     Any,
+    AsyncGenerator,
     Callable,
     Coroutine,
     Generator,
@@ -14,16 +22,30 @@ from typing import (
     TypeVar,
     overload,
 )
-from uuid import UUID, uuid4
-
-from agentlens.context import ContextStack, get_cls_name_or_raise, get_fn_name_or_raise
+from weakref import finalize, ref
+
+from agentlens.cassette import Cassette, call_key
+from agentlens.context import (
+    EMPTY_SCOPE,
+    ContextStack,
+    ScopeMap,
+    get_cls_name_or_raise,
+    get_fn_name_or_raise,
+)
 from agentlens.evaluation import (
-    GLOBAL_HOOK_KEY,
+    AsyncHook,
     Hook,
     HookFn,
     MockFn,
-    format_input_dict,
+    MockMiss,
 )
+from agentlens.memo import Memo
+from agentlens.registry import EMPTY_REGISTRY, HookRegistry, mark_observed, target_key
+
+if TYPE_CHECKING:
+    from agentlens.deferred import DeferredHooks
+
+logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 P = ParamSpec("P")
@@ -31,10 +53,11 @@ R = TypeVar("R", covariant=True)
 F = TypeVar("F", bound=Callable[..., Any])
 
 
-_hooks = ContextStack[list[HookFn]]("hooks")  # fn_name -> list[Hooks]
-_mocks = ContextStack[MockFn]("mocks")  # fn_name -> Mock
+_registry: ContextVar[HookRegistry] = ContextVar("registry", default=EMPTY_REGISTRY)
 _contexts = ContextStack[Any]("contexts")  # cls_name -> context
 
+_Running = tuple[HookFn, Hook | AsyncHook]  # a hook and the generator it returned for a call
+
 ObjectT = TypeVar("ObjectT")
 
 
@@ -42,14 +65,246 @@ def use(named_object: type[ObjectT]) -> ObjectT:
     return _contexts.use(named_object)
 
 
-@dataclass
+def try_use(named_object: type[ObjectT]) -> ObjectT | None:
+    """Like `use`, but returns None if the context was not provided"""
+    return _current_scope(_contexts).get(get_cls_name_or_raise(named_object))
+
+
+def current_observation() -> Observation | None:
+    """The innermost observation, or None outside of any observed call"""
+    return try_use(Observation)
+
+
+_observation_ids = count(1)
+_WALL_CLOCK_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
 class Observation:
-    id: UUID
+    """A single observed task call
+
+    Timestamps are monotonic nanoseconds; `start_time`/`end_time` convert them to
+    wall-clock datetimes. The parent is held weakly so that a subtree released by
+    its parent (or evicted by a `TraceStore`) is freed without waiting on the GC.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "_parent",
+        "children",
+        "depth",
+        "start_ns",
+        "end_ns",
+        "error",
+        "queue_wait_ns",
+        "network_ns",
+        "backoff_ns",
+        "retries",
+        "input_tokens",
+        "output_tokens",
+        "cache_status",
+        "coalesced",
+        "first_token_ns",
+        "__weakref__",
+    )
+
+    id: int
     name: str
-    parent: Observation | None
     children: list[Observation]
-    start_time: datetime
-    end_time: datetime | None
+    depth: int
+    start_ns: int
+    end_ns: int | None
+    error: str | None
+    queue_wait_ns: int
+    network_ns: int
+    backoff_ns: int
+    retries: int
+    input_tokens: int | None
+    output_tokens: int | None
+    cache_status: Literal["hit", "miss", "replay"] | None
+    coalesced: bool
+    first_token_ns: int | None
+
+    def __init__(self, name: str, parent: Observation | None = None):
+        self.id = next(_observation_ids)
+        self.name = name
+        self._parent = ref(parent) if parent is not None else None
+        self.children = []
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.start_ns = time.monotonic_ns()
+        self.end_ns = None
+        self.error = None
+        # filled in by inference calls made directly within this observation
+        self.queue_wait_ns = 0
+        self.network_ns = 0
+        self.backoff_ns = 0
+        self.retries = 0
+        self.input_tokens = None
+        self.output_tokens = None
+        self.cache_status = None
+        self.coalesced = False
+        self.first_token_ns = None  # latency from start to first streamed chunk
+
+    @property
+    def parent(self) -> Observation | None:
+        return self._parent() if self._parent is not None else None
+
+    @property
+    def start_time(self) -> datetime:
+        return _to_datetime(self.start_ns)
+
+    @property
+    def end_time(self) -> datetime | None:
+        return _to_datetime(self.end_ns) if self.end_ns is not None else None
+
+    @property
+    def duration_ns(self) -> int | None:
+        return self.end_ns - self.start_ns if self.end_ns is not None else None
+
+    def __repr__(self) -> str:
+        return f"Observation(id={self.id}, name={self.name!r}, depth={self.depth})"
+
+
+def wall_clock_ns(monotonic_ns: int) -> int:
+    """Convert an observation timestamp to nanoseconds since the epoch"""
+    return monotonic_ns + _WALL_CLOCK_OFFSET_NS
+
+
+def _to_datetime(monotonic_ns: int) -> datetime:
+    return datetime.fromtimestamp(wall_clock_ns(monotonic_ns) / 1e9)
+
+
+class TraceStore:
+    """Retention limits for the observation tree, provided as a context
+
+    Without a store, every observation stays linked to its parent for as long as the
+    root call lives. With one, observations deeper than `max_depth` are not linked
+    into the tree, and once more than `max_nodes` are linked, completed subtrees are
+    detached oldest-first (`eviction="oldest"`) or new ones are left unlinked
+    (`eviction="drop_new"`).
+    """
+
+    def __init__(
+        self,
+        max_nodes: int | None = None,
+        max_depth: int | None = None,
+        eviction: Literal["oldest", "drop_new"] = "oldest",
+    ):
+        if eviction not in ["oldest", "drop_new"]:
+            raise ValueError(f"Invalid eviction value: {eviction}")
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.eviction = eviction
+        self.size = 0
+        self.evicted = 0
+        self._completed: deque[ref[Observation]] = deque()
+        self._linked: dict[int, int] = {}  # root id -> nodes linked under that root
+
+    def attach(self, observation: Observation, parent: Observation) -> bool:
+        """Link an observation into its parent, returning whether it was retained"""
+        if self.max_depth is not None and observation.depth > self.max_depth:
+            return False
+        if self.max_nodes is not None and self.size >= self.max_nodes:
+            if self.eviction == "drop_new" or not self._evict():
+                return False
+        parent.children.append(observation)
+        root = _root(parent)
+        if root.id not in self._linked:
+            # a released root takes its whole tree with it, so give back what it held
+            finalize(root, self._release, root.id)
+            self._linked[root.id] = 0
+        self._linked[root.id] += 1
+        self.size += 1
+        return True
+
+    def complete(self, observation: Observation) -> None:
+        if observation.parent is not None and self.max_nodes is not None:
+            self._completed.append(ref(observation))
+            # entries of released or detached trees pile up unless the store fills;
+            # at most max_nodes are still linked, so compacting here stays amortized O(1)
+            if len(self._completed) > 2 * self.max_nodes:
+                self._completed = deque(
+                    entry
+                    for entry in self._completed
+                    if (node := entry()) is not None and node.parent is not None
+                )
+
+    def _release(self, root_id: int) -> None:
+        self.size -= self._linked.pop(root_id, 0)
+
+    def _evict(self) -> bool:
+        """Detach the oldest completed subtree that is still linked"""
+        while self._completed:
+            observation = self._completed.popleft()()
+            parent = observation.parent if observation is not None else None
+            if observation is None or parent is None:
+                continue  # freed, or already detached along with an ancestor
+            try:
+                parent.children.remove(observation)
+            except ValueError:
+                continue
+            root_id = _root(parent).id
+            observation._parent = None
+            removed = _count_nodes(observation)
+            if root_id in self._linked:
+                self._linked[root_id] -= removed
+            self.size -= removed
+            self.evicted += removed
+            return True
+        return False
+
+
+def _root(observation: Observation) -> Observation:
+    while (parent := observation.parent) is not None:
+        observation = parent
+    return observation
+
+
+def _count_nodes(observation: Observation) -> int:
+    total, pending = 0, [observation]
+    while pending:
+        node = pending.pop()
+        total += 1
+        pending.extend(node.children)
+    return total
+
+
+class _DispatchPlan:
+    """Per-function state resolved once when a task is decorated"""
+
+    __slots__ = ("fn", "key", "name", "signature", "by_keyword", "memo")
+
+    def __init__(self, fn: Callable[..., Any], name: str | None = None, memo: Memo | None = None):
+        self.fn = fn
+        self.key = target_key(fn)  # hooks and mocks are registered under this
+        mark_observed(self.key)
+        self.name = name or get_fn_name_or_raise(fn)
+        self.signature: Signature = signature(fn)
+        # whether bound inputs can be passed straight back as keyword arguments
+        self.by_keyword = all(
+            p.kind in (Parameter.POSITIONAL_OR_KEYWORD, Parameter.KEYWORD_ONLY)
+            for p in self.signature.parameters.values()
+        )
+        self.memo = memo
+
+    def bind(self, args: tuple, kwargs: dict) -> dict[str, Any]:
+        bound_args = self.signature.bind(*args, **kwargs)
+        bound_args.apply_defaults()
+        return dict(bound_args.arguments)
+
+    def call(self, input_dict: dict[str, Any]) -> Coroutine[Any, Any, Any]:
+        """Call the task with bound inputs, unpacking positional-only and variadic ones"""
+        if self.by_keyword:
+            return self.fn(**input_dict)
+        bound_args = BoundArguments(self.signature, input_dict)
+        return self.fn(*bound_args.args, **bound_args.kwargs)
+
+
+def _current_scope(stack: ContextStack[T]) -> ScopeMap[T]:
+    current = stack.current
+    if current is None:
+        return EMPTY_SCOPE
+    return current if isinstance(current, ScopeMap) else ScopeMap(current)
 
 
 @contextmanager
@@ -62,52 +317,236 @@ def provide(
     if on_conflict not in ["raise", "nest"]:
         raise ValueError(f"Invalid on_conflict value: {on_conflict}")
 
-    current_contexts = (_contexts.current or {}).copy()
-    unique_context_names = set()
+    # scopes are immutable, so maps that this call leaves unchanged are shared as-is
+    parent_contexts = _current_scope(_contexts)
+    new_contexts: dict[str, Any] = {}
     for context in contexts:
         if not (cls := getattr(context, "__class__", None)):
             raise ValueError("Only class instances can be declared as contexts")
         name = get_cls_name_or_raise(cls)
-        if name in unique_context_names:
+        if name in new_contexts:
             raise ValueError(f"Provided multiple concurrent contexts for {name}")
-        unique_context_names.add(name)
-        if name in current_contexts:
+        if name in parent_contexts:
             if on_conflict == "raise":
                 raise ValueError(f"Context {name} already provided")
-        current_contexts[name] = context
-
-    current_hooks = (_hooks.current or {}).copy()
-    for hook in hooks:
-        if not isinstance(hook, HookFn):
-            raise ValueError("Hook was not decorated with @hook")
-
-        key = GLOBAL_HOOK_KEY if hook.target is None else get_fn_name_or_raise(hook.target)
-        if key in current_hooks:
-            current_hooks[key].append(hook)
-        else:
-            current_hooks[key] = [hook]
-
-    current_mocks = (_mocks.current or {}).copy()
-    unique_mock_names = set()
-    for mock in mocks:
-        if not isinstance(mock, MockFn):
-            raise ValueError("Mock was not decorated with @mock")
-        if not mock.target:
-            name = GLOBAL_HOOK_KEY
+        new_contexts[name] = context
+    current_contexts = parent_contexts.update(new_contexts)
+
+    # registries are immutable too, so one without new hooks or mocks keeps its resolutions
+    registry = _registry.get()
+    if hooks or mocks:
+        registry = registry.extend(hooks, mocks)
+
+    token = _registry.set(registry)
+    try:
+        with _contexts.push(current_contexts):
+            yield
+    finally:
+        _registry.reset(token)
+
+
+async def _dispatch(
+    plan: _DispatchPlan, observation: Observation, args: tuple, kwargs: dict
+) -> Any:
+    resolution = _registry.get().resolve(plan.key)
+    cassette: Cassette | None = _current_scope(_contexts).get("Cassette")
+
+    # fast path: nothing to intercept, so skip argument binding entirely
+    if not resolution.intercepts and cassette is None and plan.memo is None:
+        result = await plan.fn(*args, **kwargs)
+        observation.end_ns = time.monotonic_ns()
+        return result
+
+    input_dict = plan.bind(args, kwargs)
+
+    # targeted and pattern hooks project from the bound inputs, global hooks see the raw call
+    generators: list[_Running] = []
+    for hooks, hook_args, hook_kwargs in (
+        (resolution.hooks, (), input_dict),
+        (resolution.global_hooks, args, kwargs),
+    ):
+        for hook in hooks:
+            gen = hook(hook_args, hook_kwargs)
+            if isinstance(gen, (Generator, AsyncGenerator)):
+                generators.append((hook, gen))
+
+    if generators:
+        generators, injected_inputs = await _enter_hooks(generators)
+        # rewrite task args/kwargs
+        input_dict = {**input_dict, **injected_inputs}
+
+    try:
+        result = await _call(plan, observation, resolution.mock, cassette, input_dict)
+    except Exception as e:
+        await _resume_hooks(generators, error=e)
+        raise
+
+    # send result to generator hooks
+    await _resume_hooks(generators, result=result)
+
+    observation.end_ns = time.monotonic_ns()
+    return result
+
+
+async def _enter_hooks(generators: list[_Running]) -> tuple[list[_Running], dict[str, Any]]:
+    """Run each hook up to its yield, returning those still running and the inputs they inject
+
+    Async hooks run concurrently; injected inputs are merged in hook order regardless.
+    """
+    pending = [gen.__anext__() for _, gen in generators if isinstance(gen, AsyncGenerator)]
+    entered = iter(await asyncio.gather(*pending, return_exceptions=True) if pending else ())
+
+    running: list[_Running] = []
+    injected_inputs: dict[str, Any] = {}
+    error: Exception | None = None
+    interrupt: BaseException | None = None
+    for hook, gen in generators:
+        if isinstance(gen, AsyncGenerator):
+            outcome = next(entered)
+            if isinstance(outcome, StopAsyncIteration):
+                continue  # returned without yielding, so there is nothing to resume
+            if isinstance(outcome, Exception):
+                error = error or outcome
+                continue
+            if isinstance(outcome, BaseException):
+                interrupt = interrupt or outcome
+                continue
+            new_inputs = outcome
+        elif error is not None or interrupt is not None:
+            continue  # sync hooks after a failure are never started
         else:
-            name = get_fn_name_or_raise(mock.target)
-        if name in unique_mock_names:
-            raise ValueError(f"Provided multiple concurrent mocks for {name}")
-        unique_mock_names.add(name)
-        if name in current_mocks:
-            current_mocks[name] = mock
+            try:
+                new_inputs = next(gen)
+            except StopIteration:
+                continue
+            except Exception as e:
+                error = e
+                continue
+        running.append((hook, gen))
+        injected_inputs.update(new_inputs or {})
+
+    if interrupt is not None:
+        await _close_hooks(running)
+        raise interrupt
+    if error is not None:
+        await _exit_hooks(running, error=error)
+        raise error
+    return running, injected_inputs
+
+
+async def _close_hooks(generators: list[_Running]) -> None:
+    """Close hooks without resuming them, e.g. when the call is cancelled while entering them"""
+    pending = []
+    for _, gen in generators:
+        if isinstance(gen, AsyncGenerator):
+            pending.append(gen.aclose())
+            continue
+        try:
+            gen.close()
+        except Exception as e:
+            logger.warning(f"Hook failed to close: {e!r}")
+    for outcome in await asyncio.gather(*pending, return_exceptions=True):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Hook failed to close: {outcome!r}")
+
+
+async def _resume_hooks(
+    generators: list[_Running], result: Any = None, error: Exception | None = None
+) -> None:
+    """Resume hooks with the task's outcome, handing deferred ones to the background workers"""
+    if not generators:
+        return
+    deferred_hooks: DeferredHooks | None = _current_scope(_contexts).get("DeferredHooks")
+    if deferred_hooks is not None and any(hook.deferred for hook, _ in generators):
+        deferred = [(hook, gen) for hook, gen in generators if hook.deferred]
+        generators = [(hook, gen) for hook, gen in generators if not hook.deferred]
+        await deferred_hooks.submit(partial(_exit_hooks, deferred, result, error))
+    await _exit_hooks(generators, result, error)
+
+
+async def _exit_hooks(
+    generators: list[_Running], result: Any = None, error: Exception | None = None
+) -> None:
+    """Resume each hook with the task's result or error; async hooks finish concurrently"""
+    pending = []
+    outcomes: list[BaseException | None] = []
+    for _, gen in generators:
+        if isinstance(gen, AsyncGenerator):
+            pending.append(_exit_async_hook(gen, result, error))
+            continue
+        try:
+            if error is None:
+                gen.send(result)
+            else:
+                gen.throw(type(error), error, error.__traceback__)
+        except StopIteration:
+            pass
+        except Exception as e:
+            outcomes.append(e)
+
+    if pending:
+        outcomes.extend(await asyncio.gather(*pending, return_exceptions=True))
+    for outcome in outcomes:
+        # a hook that lets the task's own error through is not a new failure
+        if isinstance(outcome, BaseException) and outcome is not error:
+            raise outcome
+
+
+async def _exit_async_hook(gen: AsyncHook, result: Any, error: Exception | None) -> None:
+    try:
+        if error is None:
+            await gen.asend(result)
         else:
-            current_mocks[name] = mock
-
-    with _contexts.push(current_contexts):
-        with _hooks.push(current_hooks):
-            with _mocks.push(current_mocks):
-                yield
+            await gen.athrow(error)
+    except StopAsyncIteration:
+        return
+    # the hook yielded again; nothing will resume it, so finalize it now
+    await gen.aclose()
+
+
+async def _call(
+    plan: _DispatchPlan,
+    observation: Observation,
+    mock: MockFn | None,
+    cassette: Cassette | None,
+    input_dict: dict[str, Any],
+) -> Any:
+    """Run the mock, a memoized or recorded result or the task itself, in that order"""
+    if mock is not None:
+        try:
+            return await mock(**input_dict)
+        except MockMiss:
+            pass
+    if plan.memo is not None:
+        return await plan.memo.call(
+            plan.fn,
+            input_dict,
+            observation,
+            partial(_execute, plan, observation, cassette, input_dict),
+        )
+    return await _execute(plan, observation, cassette, input_dict)
+
+
+async def _execute(
+    plan: _DispatchPlan,
+    observation: Observation,
+    cassette: Cassette | None,
+    input_dict: dict[str, Any],
+) -> Any:
+    if cassette is None:
+        return await plan.call(input_dict)
+
+    key = call_key(plan.fn, input_dict)
+    if key is None:
+        return await plan.call(input_dict)
+    try:
+        result = cassette.replay(key)
+    except MockMiss:
+        result = await plan.call(input_dict)
+        cassette.record(key, result)
+    else:
+        observation.cache_status = "replay"
+    return result
 
 
 @overload
@@ -115,81 +554,55 @@ def observe(fn: F) -> F: ...
 
 
 @overload
-def observe() -> (
-    Callable[[Callable[P, Coroutine[Any, Any, R]]], Callable[P, Coroutine[Any, Any, R]]]
-): ...
+def observe(
+    *, name: str | None = None, memo: Memo | None = None
+) -> Callable[[Callable[P, Coroutine[Any, Any, R]]], Callable[P, Coroutine[Any, Any, R]]]: ...
 
 
 def observe(
     fn: Callable[P, Coroutine[Any, Any, R]] | None = None,
+    *,
+    name: str | None = None,
+    memo: Memo | None = None,
 ) -> Callable[[Callable[P, Coroutine[Any, Any, R]]], Callable[P, Coroutine[Any, Any, R]]]:
+    """Trace calls to an async task, applying any provided hooks and mocks
+
+    `name` overrides the observation name, which defaults to the function's name. With
+    a `memo` policy, results of calls with the same arguments are reused.
+    """
+
     def decorator(
         fn: Callable[P, Coroutine[Any, Any, R]],
     ) -> Callable[P, Coroutine[Any, Any, R]]:
+        plan = _DispatchPlan(fn, name, memo)
+
         @wraps(fn)
         async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
-            parent_observation: Observation | None = None
+            contexts = _current_scope(_contexts)
+            parent_observation: Observation | None = contexts.get("Observation")
+            store: TraceStore | None = contexts.get("TraceStore")
+
+            observation = Observation(plan.name, parent_observation)
+            if parent_observation is not None:
+                if store is None:
+                    parent_observation.children.append(observation)
+                elif not store.attach(observation, parent_observation):
+                    observation._parent = None
+
             try:
-                parent_observation = use(Observation)
-            except Exception:
-                pass
-
-            observation = Observation(
-                id=uuid4(),
-                name=fn.__name__,
-                parent=parent_observation,
-                children=[],
-                start_time=datetime.now(),
-                end_time=None,
-            )
-            if parent_observation:
-                parent_observation.children.append(observation)
-
-            with provide(observation, on_conflict="nest"):
-                current_hooks = _hooks.current or {}
-                fn_hooks = current_hooks.get(get_fn_name_or_raise(fn), [])
-                global_hooks = current_hooks.get(GLOBAL_HOOK_KEY, [])
-                all_hooks = fn_hooks + global_hooks
-
-                generators: list[Hook] = []
-                injected_inputs: dict[str, Any] = {}
-                for hook in all_hooks:
-                    gen = hook(args, kwargs)
-                    if isinstance(gen, Generator):
-                        generators.append(gen)
-                        new_inputs = next(gen) or {}
-                        injected_inputs.update(new_inputs)
-
-                # rewrite task args/kwargs
-                input_dict = format_input_dict(fn, args, kwargs)
-                input_dict.update(injected_inputs)
-
-                # Get mock directly from current dict
-                current_mocks = _mocks.current or {}
-                mock = current_mocks.get(get_fn_name_or_raise(fn))
-
-                try:
-                    if mock is not None:
-                        result = await mock(**input_dict)
-                    else:
-                        result = await fn(**input_dict)
-                except Exception as e:
-                    for gen in generators:
-                        try:
-                            gen.throw(type(e), e, e.__traceback__)
-                        except StopIteration:
-                            pass
-                    raise
-
-                # send result to generator hooks
-                for gen in generators:
-                    try:
-                        gen.send(result)
-                    except StopIteration:
-                        pass
-
-                observation.end_time = datetime.now()
-                return result
+                with provide(observation, on_conflict="nest"):
+                    return await _dispatch(plan, observation, args, kwargs)
+            except BaseException as e:
+                observation.end_ns = time.monotonic_ns()
+                observation.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                if store is not None:
+                    store.complete(observation)
+                if (exporter := contexts.get("SpanExporter")) is not None:
+                    await exporter.export(observation)
+                if (aggregator := contexts.get("MetricsAggregator")) is not None:
+                    aggregator.record(observation)
 
         return wrapper
 
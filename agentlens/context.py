@@ -3,52 +3,177 @@ from __future__ import annotations
 from contextlib import contextmanager
 from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Any, Callable, Generic, Iterator, TypeVar
-
-from pydantic import BaseModel
+from typing import Any, Callable, Generic, Iterator, Mapping, NamedTuple, TypeVar
 
 T = TypeVar("T")
 
 
+class ScopeMap(Mapping[str, T]):
+    """Immutable mapping that shares structure with the map it was derived from
+
+    Each `set` links a single-entry overlay onto the parent map instead of copying it,
+    and chains are flattened into a fresh base once they grow past `MAX_CHAIN`, which
+    keeps lookups bounded while an unchanged scope is shared by reference.
+    """
+
+    MAX_CHAIN = 8
+
+    __slots__ = ("_key", "_value", "_parent", "_base", "_chain")
+
+    _key: str
+    _value: T
+    _parent: ScopeMap[T] | None
+    _base: dict[str, T] | None
+    _chain: int
+
+    def __init__(self, items: Mapping[str, T] | None = None):
+        self._parent = None
+        self._base = dict(items) if items else {}
+        self._chain = 0
+
+    @classmethod
+    def _overlay(cls, parent: ScopeMap[T], key: str, value: T) -> ScopeMap[T]:
+        node = cls.__new__(cls)
+        node._key = key
+        node._value = value
+        node._parent = parent
+        node._base = None
+        node._chain = parent._chain + 1
+        return node
+
+    def set(self, key: str, value: T) -> ScopeMap[T]:
+        """Return a new map with `key` bound to `value`"""
+        if self._chain >= self.MAX_CHAIN:
+            flat = self._flatten()
+            flat[key] = value
+            return ScopeMap(flat)
+        return ScopeMap._overlay(self, key, value)
+
+    def update(self, items: Mapping[str, T]) -> ScopeMap[T]:
+        """Return a new map with all `items` bound, or this map if there are none"""
+        if not items:
+            return self
+        if len(items) > 1:
+            return ScopeMap({**self._flatten(), **items})
+        ((key, value),) = items.items()
+        return self.set(key, value)
+
+    def _flatten(self) -> dict[str, T]:
+        overlays: list[ScopeMap[T]] = []
+        node: ScopeMap[T] | None = self
+        while node is not None and node._base is None:
+            overlays.append(node)
+            node = node._parent
+        flat = dict(node._base) if node is not None and node._base else {}
+        for overlay in reversed(overlays):
+            flat[overlay._key] = overlay._value
+        return flat
+
+    def __getitem__(self, key: str) -> T:
+        node: ScopeMap[T] | None = self
+        while node is not None:
+            if node._base is not None:
+                return node._base[key]
+            if node._key == key:
+                return node._value
+            node = node._parent
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]  # type: ignore[index]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._flatten())
+
+    def __len__(self) -> int:
+        return len(self._flatten())
+
+    def __bool__(self) -> bool:
+        return self._base is None or bool(self._base)
+
+    def __repr__(self) -> str:
+        return f"ScopeMap({self._flatten()!r})"
+
+
+EMPTY_SCOPE: ScopeMap[Any] = ScopeMap()
+
+
+class _Frame(NamedTuple, Generic[T]):
+    """An immutable stack frame linked to the frame below it"""
+
+    map: Mapping[str, T]
+    parent: _Frame[T] | None
+    depth: int
+
+
 @dataclass
 class ContextStack(Generic[T]):
-    """Stack-based context manager for thread-local state"""
+    """Stack-based context manager for thread-local state
+
+    The stack is a persistent linked list of frames, so pushing shares every frame
+    below it instead of copying, and child asyncio tasks inherit the top frame
+    through the contextvar snapshot.
+    """
 
     name: str
-    _stack: ContextVar[list[dict[str, T]]]
+    _top: ContextVar[_Frame[T] | None]
 
     def __init__(self, name: str):
         self.name = name
-        self._stack = ContextVar(name, default=[])
+        self._top = ContextVar(name, default=None)
 
     @property
-    def current(self) -> dict[str, T] | None:
+    def current(self) -> Mapping[str, T] | None:
         """Get current top of stack"""
-        stack = self.stack
-        return stack[-1] if stack else None
+        top = self._top.get()
+        return top.map if top is not None else None
+
+    @property
+    def depth(self) -> int:
+        top = self._top.get()
+        return top.depth if top is not None else 0
 
     @property
-    def stack(self) -> list[dict[str, T]]:
-        return self._stack.get()
+    def stack(self) -> list[Mapping[str, T]]:
+        """Materialize the stack, bottom first"""
+        maps: list[Mapping[str, T]] = []
+        frame = self._top.get()
+        while frame is not None:
+            maps.append(frame.map)
+            frame = frame.parent
+        maps.reverse()
+        return maps
 
     @contextmanager
-    def push(self, new_map: dict[str, T]) -> Iterator[dict[str, T]]:
-        token = self._stack.set(self.stack + [new_map])
+    def push(self, new_map: Mapping[str, T]) -> Iterator[Mapping[str, T]]:
+        top = self._top.get()
+        depth = top.depth + 1 if top is not None else 1
+        token = self._top.set(_Frame(new_map, top, depth))
         try:
             yield new_map
         finally:
-            self._stack.reset(token)
+            self._top.reset(token)
 
     def use(self, named_object: Any) -> T:
         name = get_cls_name_or_raise(named_object)
         current = self.current
-        if not current or name not in current:
+        if current is None or name not in current:
             raise ValueError(f"Context {name} not found")
         return current[name]
 
 
-def get_cls_name_or_raise(cls: type[BaseModel]) -> str:
-    """Get the class name for a Pydantic BaseModel class."""
+def get_cls_name_or_raise(cls: type) -> str:
+    """Get the name of a context class."""
     if not hasattr(cls, "__name__"):
         raise ValueError(f"Class {cls} has no __name__ attribute")
     return cls.__name__
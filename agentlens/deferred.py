@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+from contextlib import ExitStack
+from typing import Any, Awaitable, Callable
+
+from agentlens.client import provide
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEFERRED_WORKERS = 4
+DEFAULT_MAX_PENDING = 1000
+
+
+class DeferredHooks:
+    """Runs the post-call phase of deferred hooks in the background, provided as a context
+
+    Within `provide(DeferredHooks())`, hooks declared with `@hook(..., deferred=True)`
+    receive the task's result (or error) after the task has returned to its caller. Up
+    to `workers` of these run at once; once `max_pending` are queued or running, tasks
+    wait for room before returning, so slow hooks cannot fall arbitrarily far behind.
+    Each runs in the context of the call it observes. Failures are logged and kept in
+    `errors` rather than raised to callers.
+
+    `drain()` waits for everything queued so far. `async with DeferredHooks():` provides
+    the context and drains it on exit. Without the context, deferred hooks run inline.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_DEFERRED_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        if workers < 1 or max_pending < workers:
+            raise ValueError("Need at least one worker and room to queue work for each")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.completed = 0
+        self.errors: list[Exception] = []
+        self._running = asyncio.Semaphore(workers)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._jobs: set[asyncio.Task[None]] = set()
+        self._scopes: list[ExitStack] = []
+
+    @property
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    async def submit(self, resume: Callable[[], Awaitable[None]]) -> None:
+        """Queue `resume`, waiting while `max_pending` jobs are already queued or running"""
+        await self._pending.acquire()
+        job = asyncio.create_task(self._run(resume), context=contextvars.copy_context())
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def drain(self) -> None:
+        """Wait for every queued job, including any queued while draining"""
+        while self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    async def _run(self, resume: Callable[[], Awaitable[None]]) -> None:
+        try:
+            async with self._running:
+                await resume()
+            self.completed += 1
+        except Exception as e:
+            logger.warning(f"Deferred hook failed: {e!r}")
+            self.errors.append(e)
+        finally:
+            self._pending.release()
+
+    async def __aenter__(self) -> DeferredHooks:
+        scope = ExitStack()
+        scope.enter_context(provide(self))
+        self._scopes.append(scope)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        try:
+            await self.drain()
+        finally:
+            self._scopes.pop().close()
@@ -1,9 +1,13 @@
-from inspect import Parameter, signature
+from __future__ import annotations
+
+from inspect import BoundArguments, Parameter, Signature, signature
 from typing import (
     Any,
+    AsyncGenerator,
     Awaitable,
     Callable,
     Generator,
+    Literal,
     TypeVar,
 )
 
@@ -13,7 +17,60 @@ R = TypeVar("R")
 Hook = Generator[dict[str, Any] | None, T, None]
 """A wrapper-type hook"""
 
-GLOBAL_HOOK_KEY = "__global__"
+AsyncHook = AsyncGenerator[dict[str, Any] | None, T]
+"""A wrapper-type hook that can await I/O before and after the call"""
+
+HookMatch = str | Callable[[Callable[..., Any]], bool]
+"""Glob over a task's qualified name (`module.qualname`), or a predicate on the task"""
+
+
+class _ArgMapping:
+    """How a wrapper callback's kwargs are built from a call, resolved once per wrapper"""
+
+    __slots__ = ("mode", "names", "target_sig")
+
+    def __init__(
+        self,
+        mode: Literal["input", "varargs", "named"],
+        names: tuple[str, ...],
+        target_sig: Signature | None,
+    ):
+        self.mode = mode
+        self.names = names
+        self.target_sig = target_sig
+
+    @classmethod
+    def resolve(cls, callback_sig: Signature, target_sig: Signature | None) -> _ArgMapping:
+        callback_params = callback_sig.parameters
+        if "input" in callback_params:
+            return cls("input", ("input",), target_sig)
+        if any(
+            p.kind in (Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD)
+            for p in callback_params.values()
+        ):
+            return cls("varargs", (), target_sig)
+        return cls("named", tuple(callback_params), target_sig)
+
+    def all_args(self, args: tuple, kwargs: dict) -> dict[str, Any]:
+        if self.target_sig is None:
+            # For global hooks, combine raw args and kwargs
+            return {**{str(i): v for i, v in enumerate(args)}, **kwargs}
+        if not args:
+            # targeted hooks and mocks are handed inputs that dispatch already bound
+            return kwargs
+        bound_args = self.target_sig.bind(*args, **kwargs)
+        bound_args.apply_defaults()
+        return dict(bound_args.arguments)
+
+    def build(self, args: tuple, kwargs: dict) -> dict[str, Any]:
+        if self.mode == "varargs":
+            return {**{str(i): v for i, v in enumerate(args)}, **kwargs}
+
+        if self.mode == "input":
+            return {"input": dict(self.all_args(args, kwargs))}
+
+        all_args = self.all_args(args, kwargs)
+        return {name: all_args[name] for name in self.names if name in all_args}
 
 
 class Wrapper:
@@ -22,17 +79,23 @@ class Wrapper:
     def __init__(self, callback: Callable, target: Callable | None):
         self.callback = callback
         self.target = target
-        self._validate_params()
+        self._mapping = self._validate_params()
 
-    def _validate_params(self) -> None:
+    def _validate_params(self) -> _ArgMapping:
         """
         Validation rules:
         1) Target function cannot have a parameter named 'input'
         2) If callback has 'input' param, it must be the only param
         3) Otherwise fall back to normal validation (unless using *args/**kwargs)
+
+        Returns the resolved argument mapping for the callback.
         """
+        callback_sig = signature(self.callback)
+        callback_params = callback_sig.parameters
+
         if self.target is None:
-            return  # skip validation for global hooks
+            # skip validation for global hooks
+            return _ArgMapping.resolve(callback_sig, None)
 
         # 1) Disallow 'input' in the real function's signature
         target_sig = signature(self.target)
@@ -42,24 +105,20 @@ class Wrapper:
                 f"'input' is reserved and not allowed."
             )
 
-        callback_sig = signature(self.callback)
-        callback_params = callback_sig.parameters
+        mapping = _ArgMapping.resolve(callback_sig, target_sig)
 
         # 2) If using 'input', it must be the only parameter
-        if "input" in callback_params:
+        if mapping.mode == "input":
             if len(callback_params) != 1:
                 raise ValueError(
                     "If a hook/mock function declares a parameter named 'input', it cannot have "
                     "any additional parameters."
                 )
-            return
+            return mapping
 
         # 3a) Skip validation if using *args/**kwargs
-        if any(
-            p.kind in (Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD)
-            for p in callback_params.values()
-        ):
-            return
+        if mapping.mode == "varargs":
+            return mapping
 
         # 3b) Normal parameter validation
         for name in callback_params:
@@ -68,6 +127,7 @@ class Wrapper:
                     f"Parameter '{name}' does not exist in target function {self.target.__name__}. "
                     f"Valid parameters are: {list(target_sig.parameters.keys())}"
                 )
+        return mapping
 
     def _build_kwargs(self, args: tuple, kwargs: dict) -> dict[str, Any]:
         """
@@ -75,42 +135,24 @@ class Wrapper:
         - If callback has 'input' param, pass all args in a single dict
         - Otherwise use normal param matching or *args/**kwargs handling
         """
-        callback_sig = signature(self.callback)
-        callback_params = callback_sig.parameters
-
-        # Get all arguments from target function if it exists
-        if self.target is not None:
-            target_sig = signature(self.target)
-            bound_args = target_sig.bind(*args, **kwargs)
-            bound_args.apply_defaults()
-            all_args = dict(bound_args.arguments)
-        else:
-            # For global hooks, combine raw args and kwargs
-            all_args = {**{str(i): v for i, v in enumerate(args)}, **kwargs}
-
-        # Special handling for 'input' parameter
-        if "input" in callback_params:
-            return {"input": all_args}
-
-        # Pass everything for *args/**kwargs
-        if any(
-            p.kind in (Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD)
-            for p in callback_params.values()
-        ):
-            return {**{str(i): v for i, v in enumerate(args)}, **kwargs}
-
-        # Normal parameter matching
-        callback_kwargs = {}
-        for param_name in callback_params:
-            if param_name in all_args:
-                callback_kwargs[param_name] = all_args[param_name]
-        return callback_kwargs
+        return self._mapping.build(args, kwargs)
 
 
 class HookFn(Wrapper):
     """A hook that can intercept and modify function calls"""
 
-    def __call__(self, args: tuple, kwargs: dict) -> Hook | None:
+    def __init__(
+        self,
+        callback: Callable,
+        target: Callable | None,
+        match: HookMatch | None = None,
+        deferred: bool = False,
+    ):
+        super().__init__(callback, target)
+        self.match = match
+        self.deferred = deferred
+
+    def __call__(self, args: tuple, kwargs: dict) -> Hook | AsyncHook | None:
         """Execute the hook around a function call"""
         hook_kwargs = self._build_kwargs(args, kwargs)
         return self.callback(**hook_kwargs)
@@ -124,9 +166,21 @@ class MockFn(Wrapper):
     def __init__(self, callback: Callable, target: Callable):
         super().__init__(callback, target)
         self.target_name = target.__name__
+        # a *args/**kwargs mock of a variadic task is called the way the task would be
+        target_sig = self._mapping.target_sig
+        self._variadic_sig: Signature | None = None
+        if self._mapping.mode == "varargs" and target_sig is not None:
+            if any(
+                p.kind not in (Parameter.POSITIONAL_OR_KEYWORD, Parameter.KEYWORD_ONLY)
+                for p in target_sig.parameters.values()
+            ):
+                self._variadic_sig = target_sig
 
     async def __call__(self, **kwargs: Any) -> Any:
         """Execute the mock function with validated arguments"""
+        if self._variadic_sig is not None:
+            bound_args = BoundArguments(self._variadic_sig, kwargs)
+            return await self.callback(*bound_args.args, **bound_args.kwargs)
         mock_kwargs = self._build_kwargs((), kwargs)
         result = await self.callback(**mock_kwargs)
         return result
@@ -138,19 +192,36 @@ class MockMiss(Exception):
     pass
 
 
-def format_input_dict(fn: Callable, args: tuple, kwargs: dict) -> dict[str, Any]:
-    bound_args = signature(fn).bind(*args, **kwargs)
-    bound_args.apply_defaults()
-    return dict(bound_args.arguments)
-
-
 def hook(
     target_fn: Callable[..., Awaitable[Any]] | None = None,
+    *,
+    match: HookMatch | None = None,
+    deferred: bool = False,
 ) -> Callable[[Callable], HookFn]:
+    """Hook one task, every task whose name or function matches `match`, or every task
+
+    Pattern hooks receive each matched task's bound inputs, so they should take `input`
+    or `**kwargs` unless every matched task shares the parameters they declare.
+
+    Targeted and pattern hooks taking `**kwargs` receive inputs by parameter name, even
+    ones passed positionally; global hooks see the raw call, with positional arguments
+    under "0", "1", ...
+
+    Hooks may be async generators. The parts of a task's async hooks before and after
+    their `yield` run concurrently with each other; inputs they inject are still merged
+    in the order the hooks were provided, later hooks overriding earlier ones.
+
+    A `deferred` hook is resumed with the result after the task has returned, on the
+    background workers of a provided `DeferredHooks`, so slow scoring stays off the
+    caller's critical path. It runs inline when no `DeferredHooks` is provided.
+    """
+    if target_fn is not None and match is not None:
+        raise ValueError("A hook takes either a target function or a match pattern, not both")
+
     def decorator(hook_fn: Callable) -> HookFn:
         if not hasattr(hook_fn, "__name__"):
             raise ValueError("Hooked functions must have a __name__ attribute")
-        return HookFn(hook_fn, target_fn)
+        return HookFn(hook_fn, target_fn, match, deferred)
 
     if callable(target_fn):
         return decorator
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Iterator, Literal, NamedTuple, Self
+
+from agentlens.client import wall_clock_ns
+
+if TYPE_CHECKING:
+    from agentlens.client import Observation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+DEFAULT_MAX_QUEUE_SIZE = 10_000
+
+
+class Span(NamedTuple):
+    """A completed observation, detached from the observation tree
+
+    Timestamps are wall-clock nanoseconds since the epoch, so spans exported by
+    different processes can be ordered against each other. Observation ids are only
+    unique within a process, so a span is identified by `(process_id, id)`; a parent
+    is always in the same process as its children.
+    """
+
+    process_id: int
+    id: int
+    parent_id: int | None
+    name: str
+    depth: int
+    start_ns: int
+    end_ns: int
+    error: str | None
+
+    @classmethod
+    def from_observation(cls, observation: Observation) -> Span:
+        parent = observation.parent
+        return cls(
+            process_id=os.getpid(),
+            id=observation.id,
+            parent_id=parent.id if parent is not None else None,
+            name=observation.name,
+            depth=observation.depth,
+            start_ns=wall_clock_ns(observation.start_ns),
+            end_ns=wall_clock_ns(
+                observation.end_ns if observation.end_ns is not None else observation.start_ns
+            ),
+            error=observation.error,
+        )
+
+
+class SpanSink(ABC):
+    """Destination for batches of completed spans, written from the exporter thread
+
+    An exporter closes its sink when it is closed; a sink used on its own can be
+    closed with a `with` block.
+    """
+
+    @abstractmethod
+    def write(self, spans: list[Span]) -> None: ...
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+class _FileSink(SpanSink):
+    """Owns a file that is opened on the first write and closed with the sink"""
+
+    mode: str
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file: IO | None = None
+
+    @property
+    def file(self) -> IO:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, self.mode)
+        return self._file
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JsonlSink(_FileSink):
+    """Appends one JSON object per span"""
+
+    mode = "a"
+
+    def write(self, spans: list[Span]) -> None:
+        self.file.write("".join(json.dumps(span._asdict()) + "\n" for span in spans))
+
+
+# process id, id, parent_id (0 = root), depth, start_ns, end_ns, name length,
+# error length + 1 (0 = ok)
+_SPAN_HEADER = struct.Struct("<IQQHqqHI")
+
+
+class BinarySink(_FileSink):
+    """Appends fixed-size span headers followed by the UTF-8 name and error"""
+
+    mode = "ab"
+
+    def write(self, spans: list[Span]) -> None:
+        chunks: list[bytes] = []
+        for span in spans:
+            name = span.name.encode()
+            error = span.error.encode() if span.error is not None else b""
+            chunks.append(
+                _SPAN_HEADER.pack(
+                    span.process_id,
+                    span.id,
+                    span.parent_id or 0,
+                    span.depth,
+                    span.start_ns,
+                    span.end_ns,
+                    len(name),
+                    len(error) + (span.error is not None),
+                )
+            )
+            chunks.append(name)
+            chunks.append(error)
+        self.file.write(b"".join(chunks))
+
+
+def read_binary_spans(path: str | Path) -> Iterator[Span]:
+    """Decode a file written by `BinarySink`"""
+    data = Path(path).read_bytes()
+    offset = 0
+    while offset < len(data):
+        process_id, id, parent_id, depth, start_ns, end_ns, name_len, error_len = (
+            _SPAN_HEADER.unpack_from(data, offset)
+        )
+        offset += _SPAN_HEADER.size
+        name = data[offset : offset + name_len].decode()
+        offset += name_len
+        error = None
+        if error_len:
+            error = data[offset : offset + error_len - 1].decode()
+            offset += error_len - 1
+        yield Span(process_id, id, parent_id or None, name, depth, start_ns, end_ns, error)
+
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class SpanExporter:
+    """Streams completed observations to a sink from a background thread
+
+    Provide an exporter as a context and every observed call within it is exported
+    as soon as it finishes, including failed and cancelled calls. Spans are queued on
+    the hot path and written in batches of up to `batch_size`, or at most
+    `flush_interval` seconds after the first span of a batch was queued. When the queue is full, `on_full="block"` makes the
+    finishing call wait for room (without blocking the event loop) while
+    `on_full="drop"` discards the span and counts it in `dropped`.
+    """
+
+    def __init__(
+        self,
+        sink: SpanSink,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        on_full: Literal["block", "drop"] = "block",
+    ):
+        if on_full not in ["block", "drop"]:
+            raise ValueError(f"Invalid on_full value: {on_full}")
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_full = on_full
+        self.exported = 0
+        self.dropped = 0
+        self._queue: queue.Queue[Span | object] = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="agentlens-exporter", daemon=True)
+        self._thread.start()
+
+    async def export(self, observation: Observation) -> None:
+        if self._closed:
+            return
+        span = Span.from_observation(observation)
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            if self.on_full == "drop":
+                self.dropped += 1
+                return
+            # wait for room off the event loop, so other tasks keep running meanwhile
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.put, span)
+
+    async def flush(self) -> None:
+        """Wait until every span queued so far has been written"""
+        if self._closed:
+            return
+        await asyncio.to_thread(self._flush)
+
+    def _flush(self) -> None:
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def __enter__(self) -> SpanExporter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        batch: list[Span] = []
+        deadline = 0.0  # when the oldest buffered span must be written
+        while True:
+            try:
+                if batch:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                else:
+                    item = self._queue.get()
+            except queue.Empty:
+                self._write(batch)
+                continue
+
+            if isinstance(item, Span):
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                    self._write(batch)
+            elif item is _CLOSE:
+                self._write(batch)
+                self.sink.close()
+                return
+            elif isinstance(item, tuple) and item[0] is _FLUSH:
+                self._write(batch)
+                item[1].set()
+
+    def _write(self, batch: list[Span]) -> None:
+        if not batch:
+            return
+        try:
+            self.sink.write(batch)
+            self.sink.flush()
+            self.exported += len(batch)
+        except Exception:
+            logger.exception(f"Failed to export {len(batch)} spans")
+        batch.clear()
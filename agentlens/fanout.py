@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from contextlib import aclosing
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Literal,
+    TypeVar,
+    overload,
+)
+
+DEFAULT_CONCURRENCY = 16
+
+I = TypeVar("I")
+R = TypeVar("R")
+
+
+@overload
+def as_completed(
+    task: Callable[[I], Awaitable[R]],
+    inputs: Iterable[I],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = False,
+    return_exceptions: Literal[False] = False,
+) -> AsyncGenerator[tuple[int, R], None]: ...
+
+
+@overload
+def as_completed(
+    task: Callable[[I], Awaitable[R]],
+    inputs: Iterable[I],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = False,
+    return_exceptions: Literal[True],
+) -> AsyncGenerator[tuple[int, R | BaseException], None]: ...
+
+
+@overload
+def as_completed(
+    task: Callable[[I], Awaitable[R]],
+    inputs: Iterable[I],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = False,
+    return_exceptions: bool = False,
+) -> AsyncGenerator[tuple[int, R | BaseException], None]: ...
+
+
+def as_completed(
+    task: Callable[[I], Awaitable[R]],
+    inputs: Iterable[I],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = False,
+    return_exceptions: bool = False,
+) -> AsyncGenerator[tuple[int, Any], None]:
+    """Run `task` over `inputs` with at most `concurrency` calls in flight
+
+    Yields `(index, result)` pairs as calls finish, or in input order with `ordered`
+    (results that finish early are buffered). Inputs are consumed lazily, so observed
+    children are attached to the current observation as they start rather than all at
+    once. Each call runs in a copy of the caller's context, with its provided contexts,
+    hooks and mocks.
+
+    By default the first error cancels the calls still running and is raised; with
+    `return_exceptions` errors are yielded in place of results instead. Closing the
+    iterator early also cancels the calls still running.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    return _fan_out(
+        task, inputs, concurrency, ordered, return_exceptions, contextvars.copy_context()
+    )
+
+
+@overload
+async def bounded_map(
+    task: Callable[[I], Awaitable[R]],
+    inputs: Iterable[I],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    return_exceptions: Literal[False] = False,
+) -> list[R]: ...
+
+
+@overload
+async def bounded_map(
+    task: Callable[[I], Awaitable[R]],
+    inputs: Iterable[I],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    return_exceptions: Literal[True],
+) -> list[R | BaseException]: ...
+
+
+async def bounded_map(
+    task: Callable[[I], Awaitable[R]],
+    inputs: Iterable[I],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    return_exceptions: bool = False,
+) -> list[Any]:
+    """Bounded-concurrency counterpart of `asyncio.gather`, with results in input order"""
+    stream = as_completed(
+        task,
+        inputs,
+        concurrency=concurrency,
+        ordered=True,
+        return_exceptions=return_exceptions,
+    )
+    async with aclosing(stream):
+        return [result async for _, result in stream]
+
+
+async def _fan_out(
+    task: Callable[[Any], Awaitable[Any]],
+    inputs: Iterable[Any],
+    concurrency: int,
+    ordered: bool,
+    return_exceptions: bool,
+    context: contextvars.Context,
+) -> AsyncGenerator[tuple[int, Any], None]:
+    pending = enumerate(inputs)
+    running: dict[asyncio.Task[Any], int] = {}
+    buffered: dict[int, Any] = {}
+    next_index = 0
+    exhausted = False
+
+    async def call(item: Any) -> Any:
+        return await task(item)
+
+    def launch() -> None:
+        nonlocal exhausted
+        while not exhausted and len(running) < concurrency:
+            try:
+                index, item = next(pending)
+            except StopIteration:
+                exhausted = True
+                return
+            # a context can only be entered by one task at a time, so each gets a copy
+            child = asyncio.create_task(call(item), context=context.copy())
+            running[child] = index
+
+    try:
+        launch()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            finished: list[tuple[int, Any]] = []
+            for child in sorted(done, key=running.__getitem__):
+                index = running.pop(child)
+                error = asyncio.CancelledError() if child.cancelled() else child.exception()
+                if error is not None and not return_exceptions:
+                    raise error
+                finished.append((index, error if error is not None else child.result()))
+            # refill before handing results over, so a slow consumer does not stall calls
+            launch()
+
+            if not ordered:
+                for outcome in finished:
+                    yield outcome
+                continue
+            buffered.update(finished)
+            while next_index in buffered:
+                yield next_index, buffered.pop(next_index)
+                next_index += 1
+    finally:
+        for child in running:
+            child.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
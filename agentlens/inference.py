@@ -1,22 +1,56 @@
 from __future__ import annotations
 
 import asyncio
+import copy
+import hashlib
+import json
 import logging
 import random
 import textwrap
+import time
 from abc import ABC
+from contextlib import aclosing
 from dataclasses import dataclass
-from typing import Any, Awaitable, Callable, Literal, Type, TypeVar, overload
+from functools import lru_cache, partial
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterator,
+    Literal,
+    Type,
+    TypeVar,
+    cast,
+    get_args,
+    overload,
+)
 
 from pydantic import BaseModel
-from tenacity import AsyncRetrying, RetryError, stop_after_attempt, wait_exponential
 
-from agentlens.client import observe
+from agentlens.batch import BatchMode, BatchRequest
+from agentlens.cache import ResponseCache, SingleFlight, request_fingerprint
+from agentlens.cassette import Cassette
+from agentlens.client import Observation, current_observation, observe, try_use
+from agentlens.evaluation import MockMiss
+from agentlens.limits import AdaptiveLimiter, RateLimiter, is_overload_error
+from agentlens.partial import parse_partial
+from agentlens.retry import DEFAULT_RETRY_POLICY, RetryPolicy
+from agentlens.scheduling import Priority
 
 # Configuration constants
 DEFAULT_TIMEOUT_SECONDS = 480
 DEFAULT_MAX_RETRIES = 5
-DEFAULT_BACKOFF_MAX_SECONDS = 300  # 5 minutes max between retries
+MAX_JITTER_SECONDS = 0.1
+
+# Prompt token estimation for rate limiting
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_TOKENS = 765
+
+# Rendered prompt fragments kept for reuse across calls
+PROMPT_CACHE_SIZE = 256
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +80,8 @@ RawMessageContent = str | ImageContent | dict[str, str | dict]
 MessageContent = list[TextContent | ImageContent] | TextContent | ImageContent | str
 """Text content has been formatted as JSON"""
 
+_MESSAGE_ROLES = frozenset(get_args(MessageRole))
+
 
 class Message(BaseModel):
     """An AI chat message"""
@@ -59,20 +95,34 @@ class Message(BaseModel):
     ) -> TextContent | ImageContent:
         if isinstance(content, (str, dict)):
             text = format_prompt(content)
-            return TextContent(text=textwrap.dedent(text) if dedent else text)
+            return TextContent.model_construct(text=_dedent(text) if dedent else text)
         else:
             return content
 
+    @staticmethod
+    def trusted(role: MessageRole, content: MessageContent) -> Message:
+        """Build a message without validation, for content that is known to be well-formed"""
+        return Message.model_construct(role=role, content=content)
+
+    @staticmethod
+    def _build(role: MessageRole, content: MessageContent) -> Message:
+        items = content if isinstance(content, list) else (content,)
+        if role in _MESSAGE_ROLES and all(
+            isinstance(item, (str, TextContent, ImageContent)) for item in items
+        ):
+            return Message.trusted(role, content)
+        return Message(role=role, content=content)  # raises the usual validation error
+
     @staticmethod
     def message(role: MessageRole, *raw_content: RawMessageContent, dedent: bool = True) -> Message:
         if len(raw_content) == 1:
             content = Message._format_content(raw_content[0], dedent)
-            return Message(
-                role=role, content=content.text if isinstance(content, TextContent) else content
+            return Message._build(
+                role, content.text if isinstance(content, TextContent) else content
             )
         else:
-            return Message(
-                role=role, content=[Message._format_content(item, dedent) for item in raw_content]
+            return Message._build(
+                role, [Message._format_content(item, dedent) for item in raw_content]
             )
 
     @staticmethod
@@ -111,26 +161,107 @@ def image_content(url: str) -> ImageContent:
     return Message.image_content(url)
 
 
+class MessagePrefix:
+    """Immutable leading messages shared by many calls, e.g. a long system prompt
+
+    Pass one `prefix` to any number of `generate_text`/`generate_object` calls: each
+    call references the same `Message` objects instead of building its own. Providers
+    receive a `PrefixedMessages` list and can use its `prefix` to hash the shared part
+    once (`fingerprint`) or mark it for provider-side prompt caching.
+    """
+
+    __slots__ = ("messages", "_fingerprint", "_estimated_tokens")
+
+    def __init__(self, *messages: Message):
+        self.messages: tuple[Message, ...] = messages
+        self._fingerprint: str | None = None
+        self._estimated_tokens: int | None = None
+
+    @staticmethod
+    def from_prompts(
+        system: str | dict[str, str | dict] | None = None,
+        prompt: str | dict[str, str | dict] | None = None,
+        dedent: bool = True,
+    ) -> MessagePrefix:
+        return MessagePrefix(*_create_messages(system=system, prompt=prompt, dedent=dedent))
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of the prefix, computed once"""
+        if self._fingerprint is None:
+            dumped = [message.model_dump(mode="json") for message in self.messages]
+            encoded = json.dumps(dumped, sort_keys=True, separators=(",", ":"))
+            self._fingerprint = hashlib.sha256(encoded.encode()).hexdigest()
+        return self._fingerprint
+
+    @property
+    def estimated_tokens(self) -> int:
+        if self._estimated_tokens is None:
+            self._estimated_tokens = estimate_prompt_tokens(list(self.messages))
+        return self._estimated_tokens
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self.messages)
+
+    def __repr__(self) -> str:
+        return f"MessagePrefix({len(self.messages)} messages)"
+
+
+class PrefixedMessages(list[Message]):
+    """The messages of one call, starting with a shared `MessagePrefix`"""
+
+    __slots__ = ("prefix",)
+
+    def __init__(self, prefix: MessagePrefix, tail: list[Message]):
+        super().__init__(prefix.messages)
+        self.extend(tail)
+        self.prefix = prefix
+
+    @property
+    def tail(self) -> list[Message]:
+        """Messages after the shared prefix"""
+        return self[len(self.prefix) :]
+
+
 def format_prompt(prompt_input: str | dict[str, str | dict]) -> str:
-    """Convert a string or nested dictionary into XML-formatted text."""
+    """Convert a string or nested dictionary into XML-formatted text.
+
+    Rendered fragments are cached by content, so re-rendering a large, mostly static
+    prompt only costs a walk over its values.
+    """
     if isinstance(prompt_input, str):
         return prompt_input
+    return _render_prompt(_prompt_key(prompt_input))
 
-    xml_tags = []
-    for key, value in prompt_input.items():
-        if not value:
-            continue
 
-        if isinstance(value, dict):
-            content = format_prompt(value)  # Recursively handle nested dictionaries
+def _prompt_key(prompt_input: dict[str, Any]) -> tuple[tuple[Any, Any], ...]:
+    return tuple(
+        (key, _prompt_key(value) if isinstance(value, dict) else str(value))
+        for key, value in prompt_input.items()
+        if value
+    )
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def _render_prompt(key: tuple[tuple[Any, Any], ...]) -> str:
+    xml_tags = []
+    for tag, value in key:
+        if isinstance(value, tuple):
+            content = _render_prompt(value)  # Recursively handle nested dictionaries
         else:
-            content = textwrap.dedent(str(value)).strip()
+            content = textwrap.dedent(value).strip()
 
-        xml_tags.append(f"<{key}>\n{content}\n</{key}>")
+        xml_tags.append(f"<{tag}>\n{content}\n</{tag}>")
 
     return "\n".join(xml_tags)
 
 
+_dedent = lru_cache(maxsize=PROMPT_CACHE_SIZE)(textwrap.dedent)
+
+
 @dataclass
 class Model:
     name: str
@@ -138,24 +269,57 @@ class Model:
 
 
 class ModelProvider(ABC):
+    """Base class for inference providers
+
+    `max_connections` caps concurrent requests per model (models without an entry share
+    a pool of `max_connections_default`). With `adaptive_concurrency`, each cap is the
+    ceiling of an `AdaptiveLimiter` that backs off on rate-limit errors and timeouts and
+    recovers while calls succeed; otherwise the limit stays fixed. Either way, calls
+    waiting for a connection are admitted by `Priority`, set per call or provided as a
+    context.
+
+    `requests_per_minute` and `tokens_per_minute` set per-model token-bucket budgets.
+    Calls wait for budget before queueing for a connection, admitted on an estimate of
+    their prompt plus `max_tokens` and reconciled against reported usage afterwards.
+    """
+
     def __init__(
         self,
         name: str,
         max_connections: dict[str, int] | None = None,
         max_connections_default: int = 10,
+        adaptive_concurrency: bool = True,
+        min_connections: int = 1,
+        requests_per_minute: dict[str, int] | None = None,
+        tokens_per_minute: dict[str, int] | None = None,
     ):
         self.name = name
-        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._semaphores: dict[str, AdaptiveLimiter] = {}
+
+        def create_limiter(limit: int) -> AdaptiveLimiter:
+            if adaptive_concurrency:
+                return AdaptiveLimiter(max_limit=limit, min_limit=min(min_connections, limit))
+            return AdaptiveLimiter(max_limit=limit, min_limit=limit)
 
         if max_connections is not None:
             for model, limit in max_connections.items():
-                self._semaphores[model] = asyncio.Semaphore(limit)
+                self._semaphores[model] = create_limiter(limit)
+
+        self._default_semaphore = create_limiter(max_connections_default)
 
-        self._default_semaphore = asyncio.Semaphore(max_connections_default)
+        self._rate_limiters: dict[str, RateLimiter] = {}
+        for model in {*(requests_per_minute or {}), *(tokens_per_minute or {})}:
+            self._rate_limiters[model] = RateLimiter(
+                requests_per_minute=(requests_per_minute or {}).get(model),
+                tokens_per_minute=(tokens_per_minute or {}).get(model),
+            )
 
-    def get_semaphore(self, model: str) -> asyncio.Semaphore:
+    def get_semaphore(self, model: str) -> asyncio.Semaphore | AdaptiveLimiter:
         return self._semaphores.get(model, self._default_semaphore)
 
+    def get_rate_limiter(self, model: str) -> RateLimiter | None:
+        return self._rate_limiters.get(model)
+
     async def generate_text(
         self,
         *,
@@ -177,6 +341,54 @@ class ModelProvider(ABC):
     ) -> T:
         raise NotImplementedError
 
+    def stream_text(
+        self,
+        *,
+        model: str,
+        messages: list[Message],
+        max_tokens: int | None = None,
+        temperature: float | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield the completion in chunks; defaults to one chunk from `generate_text`"""
+
+        async def single_chunk() -> AsyncIterator[str]:
+            yield await self.generate_text(
+                model=model, messages=messages, max_tokens=max_tokens, temperature=temperature
+            )
+
+        return single_chunk()
+
+    def stream_object(
+        self,
+        *,
+        model: str,
+        messages: list[Message],
+        schema: Type[T] | dict[str, Any],
+        max_tokens: int | None = None,
+        temperature: float | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield the JSON document in chunks; defaults to one chunk from `generate_object`"""
+
+        async def single_chunk() -> AsyncIterator[str]:
+            result = await self.generate_object(
+                model=model,
+                messages=messages,
+                schema=schema,  # type: ignore[arg-type]
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+            yield _encode_response(result)
+
+        return single_chunk()
+
+    async def submit_batch(self, requests: list[BatchRequest]) -> str:
+        """Start an offline batch job for `requests` and return its id"""
+        raise NotImplementedError
+
+    async def poll_batch(self, batch_id: str) -> dict[str, Any] | None:
+        """None while the job runs, then each request's result (or exception) by `custom_id`"""
+        raise NotImplementedError
+
     def __truediv__(self, model: str) -> Model:
         return Model(name=model, provider=self)
 
@@ -199,10 +411,13 @@ async def generate_text(
     max_tokens: int | None = None,
     temperature: float | None = None,
     timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    priority: Priority | None = None,
+    prefix: MessagePrefix | None = None,
 ) -> str:
     return await _generate(
         model.provider.generate_text,
         semaphore=model.provider.get_semaphore(model.name),
+        rate_limiter=model.provider.get_rate_limiter(model.name),
         model_name=model.name,
         messages=messages,
         system=system,
@@ -213,6 +428,8 @@ async def generate_text(
         max_tokens=max_tokens,
         temperature=temperature,
         timeout=timeout,
+        priority=priority,
+        prefix=prefix,
     )
 
 
@@ -229,6 +446,8 @@ async def generate_object(
     max_tokens: int | None = None,
     temperature: float | None = None,
     timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    priority: Priority | None = None,
+    prefix: MessagePrefix | None = None,
 ) -> T: ...
 
 
@@ -245,6 +464,8 @@ async def generate_object(
     max_tokens: int | None = None,
     temperature: float | None = None,
     timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    priority: Priority | None = None,
+    prefix: MessagePrefix | None = None,
 ) -> dict[str, Any]: ...
 
 
@@ -261,12 +482,15 @@ async def generate_object(
     max_tokens: int | None = None,
     temperature: float | None = None,
     timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    priority: Priority | None = None,
+    prefix: MessagePrefix | None = None,
 ) -> T | dict[str, Any]:
     if isinstance(schema, type) and hasattr(schema, "__name__"):
         schema.__name__ = "Response"
     return await _generate(
         model.provider.generate_object,
         semaphore=model.provider.get_semaphore(model.name),
+        rate_limiter=model.provider.get_rate_limiter(model.name),
         model_name=model.name,
         schema=schema,
         messages=messages,
@@ -278,12 +502,258 @@ async def generate_object(
         max_tokens=max_tokens,
         temperature=temperature,
         timeout=timeout,
+        priority=priority,
+        prefix=prefix,
+    )
+
+
+class StreamInterruptedError(Exception):
+    """Raised when a stream fails after chunks were already delivered"""
+
+    pass
+
+
+_STREAM_END = object()
+
+
+class _StreamFailure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def stream_text(
+    model: Model,
+    messages: list[Message] | None = None,
+    system: str | dict[str, str | dict] | None = None,
+    prompt: str | dict[str, str | dict] | None = None,
+    dedent: bool = True,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    max_tokens: int | None = None,
+    temperature: float | None = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+) -> AsyncIterator[str]:
+    """Stream a text completion chunk by chunk
+
+    The request runs as an observed `stream_text` task that holds the model's
+    connection slot until the provider finishes, so closing or abandoning the iterator
+    cancels it and frees the slot. Only failures before the first chunk are retried.
+    `stream_text` itself is not observed, so hooks and mocks cannot target it.
+    """
+    return _iterate_stream(
+        partial(
+            _stream_text,
+            model,
+            messages=messages,
+            system=system,
+            prompt=prompt,
+            dedent=dedent,
+            max_retries=max_retries,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+        )
+    )
+
+
+@overload
+def stream_object(
+    model: Model,
+    schema: Type[T],
+    messages: list[Message] | None = None,
+    system: str | dict[str, str | dict] | None = None,
+    prompt: str | dict[str, str | dict] | None = None,
+    dedent: bool = True,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    max_tokens: int | None = None,
+    temperature: float | None = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+) -> AsyncIterator[T]: ...
+
+
+@overload
+def stream_object(
+    model: Model,
+    schema: dict[str, Any],
+    messages: list[Message] | None = None,
+    system: str | dict[str, str | dict] | None = None,
+    prompt: str | dict[str, str | dict] | None = None,
+    dedent: bool = True,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    max_tokens: int | None = None,
+    temperature: float | None = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+) -> AsyncIterator[dict[str, Any]]: ...
+
+
+async def stream_object(
+    model: Model,
+    schema: Type[T] | dict[str, Any],
+    messages: list[Message] | None = None,
+    system: str | dict[str, str | dict] | None = None,
+    prompt: str | dict[str, str | dict] | None = None,
+    dedent: bool = True,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    max_tokens: int | None = None,
+    temperature: float | None = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+) -> AsyncIterator[Any]:
+    """Stream a structured completion as progressively filled-in objects
+
+    For a Pydantic schema, every item but the last is an instance of
+    `partial_model(schema)` (all fields optional, validated as far as they have
+    arrived), and the last is the complete `schema` instance. For a JSON-schema dict,
+    items are partial dicts followed by the complete one. Like `stream_text`, it is not
+    itself observed, so hooks and mocks cannot target it.
+    """
+    if isinstance(schema, type) and hasattr(schema, "__name__"):
+        schema.__name__ = "Response"
+    chunks = _iterate_stream(
+        partial(
+            _stream_object,
+            model,
+            schema=schema,
+            messages=messages,
+            system=system,
+            prompt=prompt,
+            dedent=dedent,
+            max_retries=max_retries,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+        )
+    )
+    buffer = ""
+    last: Any = None
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            buffer += chunk
+            current = parse_partial(buffer, schema)
+            if current is not None and current != last:
+                last = current
+                yield current
+    yield _decode_response(buffer, schema)
+
+
+async def _iterate_stream(
+    start: Callable[[asyncio.Queue[str | object]], Awaitable[str]],
+) -> AsyncGenerator[str, None]:
+    """Run `start(queue)` as a task and yield the chunks it puts on the queue"""
+    queue: asyncio.Queue[str | object] = asyncio.Queue()
+    task = asyncio.ensure_future(_pump_stream(start(queue), queue))
+    try:
+        while (item := await queue.get()) is not _STREAM_END:
+            if isinstance(item, _StreamFailure):
+                raise item.error
+            yield cast(str, item)
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def _pump_stream(request: Awaitable[str], queue: asyncio.Queue[str | object]) -> None:
+    try:
+        await request
+    except Exception as e:
+        queue.put_nowait(_StreamFailure(e))
+    finally:
+        queue.put_nowait(_STREAM_END)
+
+
+@observe(name="stream_text")
+async def _stream_text(
+    model: Model,
+    queue: asyncio.Queue[str | object],
+    messages: list[Message] | None,
+    system: str | dict[str, str | dict] | None,
+    prompt: str | dict[str, str | dict] | None,
+    dedent: bool,
+    max_retries: int,
+    max_tokens: int | None,
+    temperature: float | None,
+    timeout: float,
+) -> str:
+    return await _stream_request(
+        model.provider.stream_text,
+        model,
+        queue,
+        _create_messages(messages=messages, system=system, prompt=prompt, dedent=dedent),
+        max_retries,
+        timeout,
+        {"max_tokens": max_tokens, "temperature": temperature},
+    )
+
+
+@observe(name="stream_object")
+async def _stream_object(
+    model: Model,
+    queue: asyncio.Queue[str | object],
+    schema: Type[BaseModel] | dict[str, Any],
+    messages: list[Message] | None,
+    system: str | dict[str, str | dict] | None,
+    prompt: str | dict[str, str | dict] | None,
+    dedent: bool,
+    max_retries: int,
+    max_tokens: int | None,
+    temperature: float | None,
+    timeout: float,
+) -> str:
+    return await _stream_request(
+        model.provider.stream_object,
+        model,
+        queue,
+        _create_messages(messages=messages, system=system, prompt=prompt, dedent=dedent),
+        max_retries,
+        timeout,
+        {"schema": schema, "max_tokens": max_tokens, "temperature": temperature},
+    )
+
+
+async def _stream_request(
+    open_stream: Callable[..., AsyncIterator[str]],
+    model: Model,
+    queue: asyncio.Queue[str | object],
+    collected_messages: list[Message],
+    max_retries: int,
+    timeout: float,
+    kwargs: dict[str, Any],
+) -> str:
+    """Forward chunks from a provider stream onto `queue`, returning the full text"""
+    observation = current_observation()
+    timings = observation if observation is not None else Observation("_stream_request")
+
+    async def consume(*, model: str, messages: list[Message], **kwargs: Any) -> str:
+        parts: list[str] = []
+        try:
+            async for chunk in open_stream(model=model, messages=messages, **kwargs):
+                if not parts:
+                    timings.first_token_ns = time.monotonic_ns() - timings.start_ns
+                parts.append(chunk)
+                queue.put_nowait(chunk)
+        except Exception as e:
+            if parts:
+                raise StreamInterruptedError(f"Stream failed after {len(parts)} chunks") from e
+            raise
+        return "".join(parts)
+
+    provider = model.provider
+    return await _request(
+        consume,
+        provider.get_semaphore(model.name),
+        provider.get_rate_limiter(model.name),
+        model.name,
+        collected_messages,
+        max_retries,
+        timeout,
+        timings,
+        kwargs,
     )
 
 
 async def _generate(
     generate: Callable[..., Awaitable[Any]],
-    semaphore: asyncio.Semaphore,
+    semaphore: asyncio.Semaphore | AdaptiveLimiter,
     model_name: str,
     messages: list[Message] | None,
     system: str | dict[str, str | dict] | None,
@@ -292,6 +762,9 @@ async def _generate(
     max_retries: int,
     capture_messages: bool,
     timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    rate_limiter: RateLimiter | None = None,
+    priority: Priority | None = None,
+    prefix: MessagePrefix | None = None,
     **kwargs,
 ) -> Any:
     collected_messages = _create_messages(
@@ -299,31 +772,217 @@ async def _generate(
         system=system,
         prompt=prompt,
         dedent=dedent,
+        prefix=prefix,
     )
-    try:
-        async for attempt in AsyncRetrying(
-            stop=stop_after_attempt(max_retries),
-            wait=wait_exponential(multiplier=1, min=1, max=DEFAULT_BACKOFF_MAX_SECONDS),
-            reraise=True,
-        ):
-            with attempt:
+    observation = current_observation()
+    timings = observation if observation is not None else Observation("_generate")
+
+    cache = try_use(ResponseCache)
+    single_flight = try_use(SingleFlight)
+    cassette = try_use(Cassette)
+    fingerprint: str | None = None
+    if cache is not None or single_flight is not None or cassette is not None:
+        fingerprint = request_fingerprint(
+            _request_kind(generate), model_name, collected_messages, **kwargs
+        )
+    if cassette is not None and fingerprint is not None:
+        try:
+            result = cassette.replay(fingerprint)
+        except MockMiss:
+            pass
+        else:
+            timings.cache_status = "replay"
+            return result
+    if cache is not None and fingerprint is not None:
+        if (cached := cache.get(fingerprint)) is not None:
+            timings.cache_status = "hit"
+            return _decode_response(cached, kwargs.get("schema"))
+        timings.cache_status = "miss"
+
+    batch_mode = try_use(BatchMode)
+
+    def send() -> Awaitable[Any]:
+        if batch_mode is not None:
+            return _submit_batched(batch_mode, generate, model_name, collected_messages, kwargs)
+        return _request(
+            generate,
+            semaphore,
+            rate_limiter,
+            model_name,
+            collected_messages,
+            max_retries,
+            timeout,
+            timings,
+            kwargs,
+            priority,
+        )
+
+    if single_flight is not None and fingerprint is not None:
+        result, coalesced = await single_flight.run(fingerprint, send)
+        if coalesced:
+            # the leader caches the response; every caller gets its own copy
+            timings.coalesced = True
+            return copy.deepcopy(result)
+    else:
+        result = await send()
+
+    if cache is not None and fingerprint is not None:
+        cache.set(fingerprint, _encode_response(result))
+    if cassette is not None and fingerprint is not None:
+        cassette.record(fingerprint, result)
+    return result
+
+
+async def _submit_batched(
+    batch_mode: BatchMode,
+    generate: Callable[..., Awaitable[Any]],
+    model_name: str,
+    collected_messages: list[Message],
+    kwargs: dict[str, Any],
+) -> Any:
+    provider = getattr(generate, "__self__", None)
+    if not isinstance(provider, ModelProvider):
+        raise TypeError("Batch mode requires a ModelProvider method")
+    request = BatchRequest(
+        kind=generate.__name__,  # type: ignore[arg-type]
+        model=model_name,
+        messages=collected_messages,
+        params=kwargs,
+    )
+    return await batch_mode.submit(provider, request)
+
+
+def _request_kind(generate: Callable[..., Awaitable[Any]]) -> str:
+    provider = getattr(generate, "__self__", None)
+    provider_name = provider.name if isinstance(provider, ModelProvider) else ""
+    return f"{provider_name}.{getattr(generate, '__name__', '')}"
+
+
+def _encode_response(result: Any) -> str:
+    if isinstance(result, BaseModel):
+        return result.model_dump_json()
+    return json.dumps(result)
+
+
+def _decode_response(raw: str, schema: Type[BaseModel] | dict[str, Any] | None) -> Any:
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return schema.model_validate_json(raw)
+    return json.loads(raw)
+
+
+async def _request(
+    generate: Callable[..., Awaitable[Any]],
+    semaphore: asyncio.Semaphore | AdaptiveLimiter,
+    rate_limiter: RateLimiter | None,
+    model_name: str,
+    collected_messages: list[Message],
+    max_retries: int,
+    timeout: float,
+    timings: Observation,
+    kwargs: dict[str, Any],
+    priority: Priority | None = None,
+) -> Any:
+    """Send a request to the provider, retrying according to the current RetryPolicy
+
+    No connection slot is held while sleeping between attempts, and retries stop early
+    on fatal errors or when the policy's retry budget is exhausted. Slots are queued for
+    at `priority`, or the Priority provided as a context.
+    """
+    policy = try_use(RetryPolicy) or DEFAULT_RETRY_POLICY
+    priority = priority or try_use(Priority)
+    policy.record_request()
+    estimated_tokens = 0
+    if rate_limiter is not None:
+        estimated_tokens = estimate_prompt_tokens(collected_messages) + (
+            kwargs.get("max_tokens") or 0
+        )
+
+    # spread out bursts of calls before they queue for a slot
+    jitter_start = time.monotonic_ns()
+    await asyncio.sleep(random.uniform(0, MAX_JITTER_SECONDS))
+    timings.backoff_ns += time.monotonic_ns() - jitter_start
+
+    attempt = 0
+    while True:
+        attempt += 1
+        timings.retries = attempt - 1
+        queued_at = time.monotonic_ns()
+        if rate_limiter is not None:
+            await rate_limiter.acquire(estimated_tokens)
+            reported_tokens = _reported_tokens(timings)
+        try:
+            slot = semaphore.slot(priority) if isinstance(semaphore, AdaptiveLimiter) else semaphore
+            async with slot:
+                sent_at = time.monotonic_ns()
+                timings.queue_wait_ns += sent_at - queued_at
                 try:
-                    async with semaphore:
-                        await asyncio.sleep(random.uniform(0, 0.1))
-                        async with asyncio.timeout(timeout):
-                            return await generate(
-                                model=model_name,
-                                messages=collected_messages,
-                                **kwargs,
-                            )
-                except Exception as e:
-                    logger.debug(
-                        f"Retry ({attempt.retry_state.attempt_number} of {max_retries}): {e}"
-                    )
-                    raise e
-    except RetryError as e:
-        logger.debug(f"Failed after {max_retries} attempts: {e}")
-        raise e
+                    async with asyncio.timeout(timeout):
+                        result = await generate(
+                            model=model_name,
+                            messages=collected_messages,
+                            **kwargs,
+                        )
+                finally:
+                    timings.network_ns += time.monotonic_ns() - sent_at
+                    if rate_limiter is not None and (
+                        used := _reported_tokens(timings) - reported_tokens
+                    ):
+                        rate_limiter.reconcile(estimated_tokens, used)
+                if isinstance(semaphore, AdaptiveLimiter):
+                    semaphore.record_success(time.monotonic_ns() - sent_at)
+                return result
+        except Exception as e:
+            if isinstance(semaphore, AdaptiveLimiter) and is_overload_error(e):
+                semaphore.record_overload()
+            if attempt >= max_retries:
+                logger.debug(f"Failed after {max_retries} attempts: {e}")
+                raise
+            if isinstance(e, StreamInterruptedError) or not policy.should_retry(e):
+                logger.debug(f"Not retrying attempt {attempt} of {max_retries}: {e}")
+                raise
+            delay = policy.delay(attempt, e)
+            logger.debug(f"Retry ({attempt} of {max_retries}) in {delay:.2f}s: {e}")
+
+        # the slot has been released, so sleeping here does not block other calls
+        await asyncio.sleep(delay)
+        timings.backoff_ns += int(delay * 1e9)
+
+
+def _reported_tokens(observation: Observation) -> int:
+    return (observation.input_tokens or 0) + (observation.output_tokens or 0)
+
+
+def estimate_prompt_tokens(messages: list[Message]) -> int:
+    """Rough prompt size (~4 characters per token) used to admit rate-limited calls"""
+    if isinstance(messages, PrefixedMessages):
+        return messages.prefix.estimated_tokens + estimate_prompt_tokens(messages.tail)
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS
+        contents = message.content if isinstance(message.content, list) else [message.content]
+        for content in contents:
+            if isinstance(content, str):
+                total += len(content) // CHARS_PER_TOKEN
+            elif isinstance(content, TextContent):
+                total += len(content.text) // CHARS_PER_TOKEN
+            else:
+                total += IMAGE_TOKENS
+    return total
+
+
+def report_usage(input_tokens: int | None = None, output_tokens: int | None = None) -> None:
+    """Record token usage for the current inference call
+
+    Providers call this from `generate_text`/`generate_object` when the API reports
+    usage; counts accumulate across retries on the calling observation.
+    """
+    observation = current_observation()
+    if observation is None:
+        return
+    if input_tokens is not None:
+        observation.input_tokens = (observation.input_tokens or 0) + input_tokens
+    if output_tokens is not None:
+        observation.output_tokens = (observation.output_tokens or 0) + output_tokens
 
 
 def _create_messages(
@@ -331,10 +990,13 @@ def _create_messages(
     system: str | dict[str, str | dict] | None = None,
     prompt: str | dict[str, str | dict] | None = None,
     dedent: bool = True,
+    prefix: MessagePrefix | None = None,
 ) -> list[Message]:
     # check for invalid combinations
     if messages and (system or prompt):
         raise ValueError("Cannot specify both 'messages' and 'system'/'prompt'")
+    if prefix is not None and system:
+        raise ValueError("Cannot specify both 'prefix' and 'system'")
 
     # create messages if passed prompts
     if not messages:
@@ -344,4 +1006,6 @@ def _create_messages(
         if prompt:
             messages.append(user_message(prompt, dedent=dedent))
 
+    if prefix is not None:
+        return PrefixedMessages(prefix, messages)
     return messages
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from types import TracebackType
+from typing import AsyncIterator
+
+from agentlens.retry import status_code
+from agentlens.scheduling import (
+    DEFAULT_PRIORITY,
+    DEFAULT_STARVATION_TIMEOUT_SECONDS,
+    FairQueue,
+    Priority,
+    QueueStats,
+)
+
+DEFAULT_BACKOFF_RATIO = 0.9
+DEFAULT_LATENCY_SMOOTHING = 0.05
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Whether an inference error means the provider is saturated (429, 503 or a timeout)"""
+    if isinstance(error, TimeoutError):
+        return True
+    if status_code(error) in (429, 503):
+        return True
+    name = type(error).__name__
+    return "RateLimit" in name or "Overloaded" in name
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit that can stand in for an `asyncio.Semaphore`
+
+    The limit grows by roughly one slot per limit's worth of successful calls and
+    shrinks by `backoff_ratio` on overload errors. With `latency_tolerance` set, it
+    also shrinks (at most once per limit's worth of calls) when the smoothed latency
+    exceeds that multiple of the best observed latency. It never leaves
+    `[min_limit, max_limit]`. Callers report outcomes with `record_success` and
+    `record_overload`; using the limiter as a plain async context manager just bounds
+    concurrency at the current limit.
+
+    Calls that have to wait are admitted by `Priority` through a `FairQueue`, whose
+    per-level depth and wait times are exposed as `stats`.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: int | None = None,
+        backoff_ratio: float = DEFAULT_BACKOFF_RATIO,
+        latency_tolerance: float | None = None,
+        latency_smoothing: float = DEFAULT_LATENCY_SMOOTHING,
+        starvation_timeout: float | None = DEFAULT_STARVATION_TIMEOUT_SECONDS,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"Invalid limits: min_limit={min_limit}, max_limit={max_limit}")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.latency_smoothing = latency_smoothing
+        self._limit = float(initial_limit if initial_limit is not None else max_limit)
+        self._in_flight = 0
+        self._waiters: FairQueue[asyncio.Future[None]] = FairQueue(starvation_timeout)
+        self._min_latency_ns: int | None = None
+        self._avg_latency_ns: float | None = None
+        self._since_decrease = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def stats(self) -> dict[int, QueueStats]:
+        """Queue depth and wait times per priority level"""
+        return self._waiters.stats
+
+    def locked(self) -> bool:
+        return self._in_flight >= self.limit
+
+    async def acquire(self, priority: Priority | None = None) -> bool:
+        priority = priority or DEFAULT_PRIORITY
+        if not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            self._waiters.admitted(priority)
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.push(waiter, priority)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just before cancellation
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        return True
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.pop()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    def record_success(self, latency_ns: int) -> None:
+        if self._min_latency_ns is None or latency_ns < self._min_latency_ns:
+            self._min_latency_ns = latency_ns
+        if self._avg_latency_ns is None:
+            self._avg_latency_ns = float(latency_ns)
+        else:
+            self._avg_latency_ns += self.latency_smoothing * (latency_ns - self._avg_latency_ns)
+
+        self._since_decrease += 1
+
+        if (
+            self.latency_tolerance is not None
+            and self._avg_latency_ns > self.latency_tolerance * self._min_latency_ns
+        ):
+            if self._since_decrease >= self.limit:
+                self._decrease()
+        elif self._in_flight >= self.limit // 2:
+            # only grow while the current limit is actually being used
+            self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            self._wake()
+
+    def record_overload(self) -> None:
+        self._decrease()
+
+    def _decrease(self) -> None:
+        self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+        self._since_decrease = 0
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority | None = None) -> AsyncIterator[None]:
+        """Hold one slot, queueing at `priority` if the limit is reached"""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.release()
+
+    def __repr__(self) -> str:
+        return f"AdaptiveLimiter(limit={self.limit}, in_flight={self._in_flight})"
+
+
+class TokenBucket:
+    """Continuously refilling budget, e.g. requests or tokens per minute
+
+    Waiters are admitted in FIFO order. Requests larger than the capacity are clamped
+    to it so they can still be admitted, and `adjust` may push the level negative to
+    charge for usage discovered after the fact.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        if capacity <= 0 or refill_per_second <= 0:
+            raise ValueError("TokenBucket capacity and refill rate must be positive")
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._level = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, budget: float) -> TokenBucket:
+        return cls(capacity=budget, refill_per_second=budget / 60)
+
+    @property
+    def level(self) -> float:
+        self._refill()
+        return self._level
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(
+            self.capacity, self._level + (now - self._updated_at) * self.refill_per_second
+        )
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Wait until `amount` is available and take it, returning the seconds waited"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self._level < amount:
+                delay = (amount - self._level) / self.refill_per_second
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._level -= amount
+        return waited
+
+    def adjust(self, delta: float) -> None:
+        """Charge (positive) or refund (negative) budget after the fact"""
+        self._refill()
+        self._level = min(self.capacity, self._level - delta)
+
+
+class RateLimiter:
+    """Per-model requests-per-minute and tokens-per-minute budgets"""
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+    ):
+        self.requests = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket.per_minute(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, estimated_tokens: int) -> float:
+        """Wait for one request and `estimated_tokens`, returning the seconds waited"""
+        waited = 0.0
+        if self.requests is not None:
+            waited += await self.requests.acquire(1)
+        if self.tokens is not None:
+            waited += await self.tokens.acquire(estimated_tokens)
+        return waited
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        if self.tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
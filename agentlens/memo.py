@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import base64
+import logging
+import pickle
+import time
+import zlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from agentlens.cache import ResponseCache, SingleFlight
+from agentlens.cassette import call_key
+
+if TYPE_CHECKING:
+    from agentlens.client import Observation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMO_ENTRIES = 1024
+
+_MISSING = object()
+
+
+class Memo:
+    """Memoization policy for an observed task, e.g. `@observe(memo=Memo())`
+
+    Results are keyed by the task's bound arguments and kept in an in-process LRU of
+    `max_entries` for up to `ttl` seconds, and in `persist` (a `ResponseCache`, e.g.
+    backed by a SQLite file) when given. Concurrent calls with the same key share one
+    execution. `encoders` maps argument types to stable stand-ins for hashing, such as
+    a document's id instead of its full contents; calls whose arguments cannot be
+    encoded are not memoized. Errors are never cached, and cached results are shared,
+    not copied.
+
+    Hits are still observed, with `cache_status` set to "hit".
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MEMO_ENTRIES,
+        ttl: float | None = None,
+        persist: ResponseCache | None = None,
+        encoders: dict[type, Callable[[Any], Any]] | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist = persist
+        self.encoders = encoders or {}
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._flights = SingleFlight()
+
+    def key(self, fn: Callable[..., Any], inputs: dict[str, Any]) -> str | None:
+        return call_key(fn, inputs, self._encode if self.encoders else None)
+
+    def _encode(self, value: Any) -> Any:
+        for cls, encode in self.encoders.items():
+            if isinstance(value, cls):
+                return encode(value)
+        return NotImplemented
+
+    async def call(
+        self,
+        fn: Callable[..., Any],
+        inputs: dict[str, Any],
+        observation: Observation,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        key = self.key(fn, inputs)
+        if key is None:
+            return await compute()
+
+        if (result := self._lookup(key)) is not _MISSING:
+            self.hits += 1
+            observation.cache_status = "hit"
+            return result
+
+        async def compute_and_store() -> Any:
+            result = await compute()
+            # stored before the flight ends, so later callers never miss it
+            self._store(key, result)
+            return result
+
+        result, coalesced = await self._flights.run(key, compute_and_store)
+        if coalesced:
+            self.hits += 1
+            observation.cache_status = "hit"
+            observation.coalesced = True
+        else:
+            self.misses += 1
+            observation.cache_status = "miss"
+        return result
+
+    def _lookup(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self.ttl is None or time.monotonic() - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                return entry[0]
+            del self._entries[key]
+
+        if self.persist is not None and (raw := self.persist.get(key)) is not None:
+            result = pickle.loads(zlib.decompress(base64.b64decode(raw)))
+            self._remember(key, result)
+            return result
+        return _MISSING
+
+    def _store(self, key: str, result: Any) -> None:
+        self._remember(key, result)
+        if self.persist is None:
+            return
+        try:
+            blob = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.debug(f"Not persisting {key}: {e}")
+            return
+        self.persist.set(key, base64.b64encode(blob).decode())
+
+    def _remember(self, key: str, result: Any) -> None:
+        self._entries[key] = (result, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from agentlens.client import Observation
+
+SUB_BUCKET_BITS = 5
+"""Each power of two is split into 2**(SUB_BUCKET_BITS - 1) buckets (~3% precision)"""
+
+_SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+_SUB_BUCKET_HALF = _SUB_BUCKET_COUNT >> 1
+
+
+def _bucket_index(value: int) -> int:
+    if value < _SUB_BUCKET_COUNT:
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * _SUB_BUCKET_HALF + (value >> shift)
+
+
+def _bucket_floor(index: int) -> int:
+    if index < _SUB_BUCKET_COUNT:
+        return index
+    shift = index // _SUB_BUCKET_HALF - 1
+    return (index - shift * _SUB_BUCKET_HALF) << shift
+
+
+class LatencyHistogram:
+    """Log-linear (HDR-style) histogram of nanosecond values with sparse buckets"""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: int | None = None
+        self.max: int | None = None
+
+    def record(self, value: int) -> None:
+        index = _bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: LatencyHistogram) -> None:
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p: float) -> int | None:
+        """Lower bound of the bucket holding the `p`th percentile, clamped to min/max"""
+        if not self.count:
+            return None
+        rank = max(1, round(self.count * p / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                value = _bucket_floor(index)
+                return min(max(value, self.min or 0), self.max or value)
+        return self.max
+
+
+@dataclass
+class TaskMetrics:
+    """Aggregated timings and usage for every observed call of one task"""
+
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    queue_wait: LatencyHistogram = field(default_factory=LatencyHistogram)
+    network: LatencyHistogram = field(default_factory=LatencyHistogram)
+    errors: int = 0
+    retries: int = 0
+    backoff_ns: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+class MetricsAggregator:
+    """In-process per-task metrics, provided as a context
+
+    Every observed call that finishes within `provide(aggregator)` is folded into
+    the `TaskMetrics` for its task name.
+    """
+
+    def __init__(self) -> None:
+        self.tasks: dict[str, TaskMetrics] = {}
+
+    def record(self, observation: Observation) -> None:
+        metrics = self.tasks.get(observation.name)
+        if metrics is None:
+            metrics = self.tasks[observation.name] = TaskMetrics()
+        if (duration := observation.duration_ns) is not None:
+            metrics.latency.record(duration)
+        if observation.error is not None:
+            metrics.errors += 1
+        if observation.queue_wait_ns or observation.network_ns:
+            metrics.queue_wait.record(observation.queue_wait_ns)
+            metrics.network.record(observation.network_ns)
+        metrics.retries += observation.retries
+        metrics.backoff_ns += observation.backoff_ns
+        metrics.input_tokens += observation.input_tokens or 0
+        metrics.output_tokens += observation.output_tokens or 0
+
+    def summary(self, percentiles: tuple[float, ...] = (50, 90, 99)) -> dict[str, dict]:
+        """Latency percentiles (in ns) and counters per task name"""
+        return {
+            name: {
+                "count": m.latency.count,
+                "errors": m.errors,
+                "mean_ns": m.latency.mean,
+                **{f"p{p:g}_ns": m.latency.percentile(p) for p in percentiles},
+                "retries": m.retries,
+                "backoff_ns": m.backoff_ns,
+                "input_tokens": m.input_tokens,
+                "output_tokens": m.output_tokens,
+            }
+            for name, m in self.tasks.items()
+        }
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import types
+from functools import lru_cache
+from typing import Any, Optional, Union, get_args, get_origin
+
+from pydantic import BaseModel, Field, ValidationError, create_model
+from pydantic_core import from_json
+
+
+@lru_cache(maxsize=None)
+def partial_model(schema: type[BaseModel]) -> type[BaseModel]:
+    """A copy of `schema` in which every field, at any depth, is optional"""
+    fields: dict[str, Any] = {
+        name: (Optional[_partial_annotation(field.annotation)], Field(None, alias=field.alias))
+        for name, field in schema.model_fields.items()
+    }
+    return create_model(  # type: ignore[call-overload]
+        f"Partial{schema.__name__}",
+        __config__=schema.model_config,
+        __module__=schema.__module__,
+        **fields,
+    )
+
+
+def _partial_annotation(annotation: Any) -> Any:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return partial_model(annotation)
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is None or not args:
+        return annotation
+    partial_args = tuple(_partial_annotation(arg) for arg in args)
+    if origin is Union or origin is types.UnionType:
+        return Union[partial_args]
+    try:
+        return origin[partial_args if len(partial_args) > 1 else partial_args[0]]
+    except TypeError:
+        return annotation
+
+
+def parse_partial(buffer: str, schema: type[BaseModel] | dict[str, Any]) -> Any | None:
+    """Best-effort parse of an incomplete JSON document
+
+    For Pydantic schemas the result is validated against `partial_model(schema)`, so
+    fields are filled in as they arrive; for JSON-schema dicts it is the partial dict.
+    Returns None when nothing usable has arrived yet.
+    """
+    if not buffer.strip():
+        return None
+    for allow_partial in ("trailing-strings", True):
+        try:
+            data = from_json(buffer, allow_partial=allow_partial)
+        except ValueError:
+            return None
+        if not (isinstance(schema, type) and issubclass(schema, BaseModel)):
+            return data
+        try:
+            return partial_model(schema).model_validate(data)
+        except ValidationError:
+            continue  # e.g. an incomplete string that does not match a Literal yet
+    return None
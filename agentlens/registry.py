@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from fnmatch import fnmatchcase
+from inspect import unwrap
+from typing import Any, Callable, NamedTuple
+from weakref import WeakKeyDictionary, WeakSet
+
+from agentlens.evaluation import HookFn, MockFn
+
+_observed: WeakSet[Callable[..., Any]] = WeakSet()
+
+
+def target_key(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Identity that hooks and mocks for `fn` are registered under: the undecorated function"""
+    return unwrap(fn)
+
+
+def mark_observed(key: Callable[..., Any]) -> None:
+    """Record that calls to the function under `key` are dispatched through `observe`"""
+    _observed.add(key)
+
+
+def _observed_key(target: Callable[..., Any]) -> Callable[..., Any]:
+    key = target_key(target)
+    if key not in _observed:
+        raise ValueError(
+            f"{qualified_name(target)} is not an observed task, so hooks and mocks on it "
+            "would never run"
+        )
+    return key
+
+
+def qualified_name(fn: Callable[..., Any]) -> str:
+    return f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', repr(fn))}"
+
+
+def _matches(hook: HookFn, fn: Callable[..., Any]) -> bool:
+    if isinstance(hook.match, str):
+        return fnmatchcase(qualified_name(fn), hook.match)
+    return hook.match is not None and hook.match(fn)
+
+
+class Resolution(NamedTuple):
+    """Everything provided that intercepts calls to one task"""
+
+    hooks: tuple[HookFn, ...]
+    """Targeted and pattern hooks, which see the bound inputs"""
+    global_hooks: tuple[HookFn, ...]
+    """Hooks on every task, which see the raw call"""
+    mock: MockFn | None
+
+    @property
+    def intercepts(self) -> bool:
+        return bool(self.hooks or self.global_hooks or self.mock is not None)
+
+
+class HookRegistry:
+    """Immutable set of provided hooks and mocks, indexed by target
+
+    Each `provide()` that adds hooks or mocks derives a new registry from the current
+    one; otherwise the registry, and the resolutions it has cached, are shared. A
+    task's resolution (its targeted hooks, pattern hooks whose glob or predicate match
+    it, global hooks and mock) is computed on its first call within a registry, so
+    later lookups are a single dict hit.
+    """
+
+    __slots__ = ("targeted", "patterns", "global_hooks", "mocks", "_resolved")
+
+    def __init__(
+        self,
+        targeted: dict[Callable[..., Any], tuple[HookFn, ...]],
+        patterns: tuple[HookFn, ...],
+        global_hooks: tuple[HookFn, ...],
+        mocks: dict[Callable[..., Any], MockFn],
+    ):
+        self.targeted = targeted
+        self.patterns = patterns
+        self.global_hooks = global_hooks
+        self.mocks = mocks
+        # weak, so that caching a resolution does not keep its task alive
+        self._resolved: WeakKeyDictionary[Callable[..., Any], Resolution] = WeakKeyDictionary()
+
+    def extend(self, hooks: list[HookFn], mocks: list[MockFn]) -> HookRegistry:
+        """A registry with `hooks` added after the current ones and `mocks` overriding them"""
+        targeted = dict(self.targeted)
+        patterns = list(self.patterns)
+        global_hooks = list(self.global_hooks)
+        for hook in hooks:
+            if not isinstance(hook, HookFn):
+                raise ValueError("Hook was not decorated with @hook")
+            if hook.match is not None:
+                patterns.append(hook)
+            elif hook.target is None:
+                global_hooks.append(hook)
+            else:
+                key = _observed_key(hook.target)
+                targeted[key] = (*targeted.get(key, ()), hook)
+
+        new_mocks: dict[Callable[..., Any], MockFn] = {}
+        for mock in mocks:
+            if not isinstance(mock, MockFn) or mock.target is None:
+                raise ValueError("Mock was not decorated with @mock")
+            key = _observed_key(mock.target)
+            if key in new_mocks:
+                raise ValueError(f"Provided multiple concurrent mocks for {mock.target_name}")
+            new_mocks[key] = mock
+
+        return HookRegistry(
+            targeted, tuple(patterns), tuple(global_hooks), {**self.mocks, **new_mocks}
+        )
+
+    def resolve(self, key: Callable[..., Any]) -> Resolution:
+        resolution = self._resolved.get(key)
+        if resolution is None:
+            hooks = self.targeted.get(key, ()) + tuple(
+                hook for hook in self.patterns if _matches(hook, key)
+            )
+            resolution = self._resolved[key] = Resolution(
+                hooks, self.global_hooks, self.mocks.get(key)
+            )
+        return resolution
+
+
+EMPTY_REGISTRY = HookRegistry({}, (), (), {})
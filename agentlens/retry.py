@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable
+
+DEFAULT_BACKOFF_MIN_SECONDS = 1.0
+DEFAULT_BACKOFF_MAX_SECONDS = 300.0  # 5 minutes max between retries
+DEFAULT_RETRY_RATIO = 0.1
+DEFAULT_MIN_RETRIES_PER_SECOND = 1.0
+DEFAULT_MAX_RETRY_BALANCE = 100.0
+
+FATAL_STATUS_CODES = frozenset({400, 401, 403, 404, 422})
+FATAL_ERRORS: tuple[type[BaseException], ...] = (NotImplementedError, TypeError)
+
+
+def status_code(error: BaseException) -> int | None:
+    """HTTP status carried by a provider SDK exception, if any"""
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an inference error may succeed on a later attempt
+
+    Client errors (bad request, auth, not found, unprocessable) and programming errors
+    are fatal; rate limits, server errors, timeouts and unknown errors are retried.
+    """
+    if isinstance(error, FATAL_ERRORS):
+        return False
+    return status_code(error) not in FATAL_STATUS_CODES
+
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """Server-requested delay from a `retry_after` attribute or Retry-After response header"""
+    retry_after = getattr(error, "retry_after", None)
+    if isinstance(retry_after, (int, float)):
+        return max(0.0, float(retry_after))
+
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None:
+        return None
+    if (ms := headers.get("retry-after-ms")) is not None:
+        try:
+            return max(0.0, float(ms) / 1000)
+        except ValueError:
+            pass
+    if (value := headers.get("retry-after")) is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """Caps retries to a fraction of request traffic across every caller sharing it
+
+    Each first attempt deposits `ratio` of a retry and each retry withdraws a whole
+    one, so that at most ~`ratio` of traffic can be retries. `min_retries_per_second`
+    keeps a trickle of retries available when traffic is low.
+    """
+
+    def __init__(
+        self,
+        ratio: float = DEFAULT_RETRY_RATIO,
+        min_retries_per_second: float = DEFAULT_MIN_RETRIES_PER_SECOND,
+        max_balance: float = DEFAULT_MAX_RETRY_BALANCE,
+    ):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_balance = max_balance
+        self.rejected = 0
+        self._balance = max_balance
+        self._updated_at = time.monotonic()
+
+    @property
+    def balance(self) -> float:
+        self._refill()
+        return self._balance
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._balance = min(
+            self.max_balance,
+            self._balance + (now - self._updated_at) * self.min_retries_per_second,
+        )
+        self._updated_at = now
+
+    def record_request(self) -> None:
+        self._refill()
+        self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def try_retry(self) -> bool:
+        self._refill()
+        if self._balance < 1:
+            self.rejected += 1
+            return False
+        self._balance -= 1
+        return True
+
+
+DEFAULT_RETRY_BUDGET = RetryBudget()
+"""Shared by every inference call in the process unless a RetryPolicy overrides it"""
+
+
+class RetryPolicy:
+    """How inference calls are retried, provided as a context to override the default
+
+    Delays use exponential backoff with full jitter between `backoff_min` and
+    `backoff_max`, unless the error carries a Retry-After hint, which is honored (capped
+    at `backoff_max`). The number of attempts is set per call with `max_retries`.
+    """
+
+    def __init__(
+        self,
+        backoff_min: float = DEFAULT_BACKOFF_MIN_SECONDS,
+        backoff_max: float = DEFAULT_BACKOFF_MAX_SECONDS,
+        budget: RetryBudget | None = DEFAULT_RETRY_BUDGET,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ):
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.budget = budget
+        self.retryable = retryable
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """Seconds to wait after failed attempt number `attempt` (starting at 1)"""
+        hinted = retry_after_seconds(error)
+        if hinted is not None:
+            return min(hinted, self.backoff_max)
+        ceiling = min(self.backoff_max, self.backoff_min * 2 ** (attempt - 1))
+        return random.uniform(self.backoff_min, max(self.backoff_min, ceiling))
+
+    def should_retry(self, error: BaseException) -> bool:
+        if not self.retryable(error):
+            return False
+        return self.budget is None or self.budget.try_retry()
+
+    def record_request(self) -> None:
+        if self.budget is not None:
+            self.budget.record_request()
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
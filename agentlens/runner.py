@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from importlib import import_module
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable
+
+from pydantic import BaseModel
+
+from agentlens import fanout
+from agentlens.client import provide
+from agentlens.deferred import DeferredHooks
+from agentlens.metrics import LatencyHistogram
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_CONCURRENCY = 8
+
+_STOP = None
+
+
+def load_module(file_path: str) -> ModuleType:
+    """Import a Python file by its dotted path relative to the working directory"""
+    path = Path(file_path)
+    if not path.suffix == ".py":
+        raise ValueError("File must be a Python file")
+
+    # Convert path/to/file.py to path.to.file
+    module_path = str(path.with_suffix("")).replace("/", ".").replace("\\", ".")
+    return import_module(module_path)
+
+
+def resolve(module: ModuleType, spec: str) -> Any:
+    """Look up `name` in `module`, or `package.module:name` anywhere"""
+    if ":" in spec:
+        module_path, name = spec.split(":", 1)
+        module = import_module(module_path)
+    else:
+        name = spec
+    if (item := module.__dict__.get(name)) is None:
+        raise LookupError(f"'{name}' not found in {module.__name__}")
+    return item
+
+
+def load_dataset(path: str | Path) -> list[Any]:
+    """Inputs from a JSON array or a JSON Lines file"""
+    text = Path(path).read_text()
+    if Path(path).suffix == ".json":
+        data = json.loads(text)
+        if not isinstance(data, list):
+            raise ValueError("A JSON dataset must be an array of inputs")
+        return data
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+@dataclass
+class ItemResult:
+    """Outcome of running the function on one dataset input"""
+
+    index: int
+    output: Any = None
+    error: str | None = None
+    duration_ns: int = 0
+    worker: int = 0
+
+
+@dataclass
+class RunReport:
+    """Per-item results of a sharded run, merged across workers in input order"""
+
+    results: list[ItemResult] = field(default_factory=list)
+    wall_time_ns: int = 0
+    workers: int = 1
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def errors(self) -> int:
+        return sum(result.error is not None for result in self.results)
+
+    def add(self, result: ItemResult) -> None:
+        self.results.append(result)
+        self.latency.record(result.duration_ns)
+
+    def summary(self, percentiles: tuple[float, ...] = (50, 90, 99)) -> dict[str, Any]:
+        return {
+            "items": len(self.results),
+            "errors": self.errors,
+            "workers": self.workers,
+            "wall_time_ns": self.wall_time_ns,
+            "mean_ns": self.latency.mean,
+            **{f"p{p:g}_ns": self.latency.percentile(p) for p in percentiles},
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "summary": self.summary(),
+            "results": [
+                {
+                    "index": r.index,
+                    "output": r.output,
+                    "error": r.error,
+                    "duration_ns": r.duration_ns,
+                    "worker": r.worker,
+                }
+                for r in self.results
+            ],
+        }
+
+
+def run_dataset(
+    file_path: str,
+    function_name: str,
+    inputs: list[Any],
+    workers: int = DEFAULT_WORKERS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    hooks: list[str] = [],
+    mocks: list[str] = [],
+    on_result: Callable[[ItemResult], None] | None = None,
+) -> RunReport:
+    """Run `function_name` from `file_path` over `inputs`, sharded across processes
+
+    Inputs are dealt round-robin to `workers` processes. Each worker imports the file,
+    provides the named `hooks` and `mocks` and runs its shard on its own event loop
+    with up to `concurrency` items in flight, draining deferred hooks before it exits.
+    A dict input is passed as keyword arguments, anything else as the only positional
+    argument. Results stream back to `on_result` as items finish and are merged into
+    one report.
+    """
+    workers = max(1, min(workers, len(inputs)))
+    shards: list[list[tuple[int, Any]]] = [[] for _ in range(workers)]
+    for index, item in enumerate(inputs):
+        shards[index % workers].append((index, item))
+
+    report = RunReport(workers=workers)
+    start = time.monotonic_ns()
+    # spawned workers do not inherit the parent's threads, locks or event loop
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.Queue()
+        collector = threading.Thread(
+            target=_collect, args=(results, report, on_result), daemon=True
+        )
+        collector.start()
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [
+                    pool.submit(
+                        _run_shard,
+                        worker,
+                        file_path,
+                        function_name,
+                        shard,
+                        concurrency,
+                        hooks,
+                        mocks,
+                        results,
+                    )
+                    for worker, shard in enumerate(shards)
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            # every worker has exited, so its results are already queued ahead of this
+            results.put(_STOP)
+            collector.join()
+    report.wall_time_ns = time.monotonic_ns() - start
+    report.results.sort(key=lambda result: result.index)
+    return report
+
+
+def _collect(
+    results: Any,
+    report: RunReport,
+    on_result: Callable[[ItemResult], None] | None,
+) -> None:
+    while (result := results.get()) is not _STOP:
+        report.add(result)
+        if on_result is not None:
+            on_result(result)
+
+
+def _run_shard(
+    worker: int,
+    file_path: str,
+    function_name: str,
+    shard: list[tuple[int, Any]],
+    concurrency: int,
+    hooks: list[str],
+    mocks: list[str],
+    results: Any,
+) -> None:
+    module = load_module(file_path)
+    asyncio.run(
+        _run_items(
+            worker,
+            resolve(module, function_name),
+            shard,
+            concurrency,
+            [resolve(module, spec) for spec in hooks],
+            [resolve(module, spec) for spec in mocks],
+            results,
+        )
+    )
+
+
+async def _run_items(
+    worker: int,
+    func: Callable[..., Any],
+    shard: list[tuple[int, Any]],
+    concurrency: int,
+    hooks: list[Any],
+    mocks: list[Any],
+    results: Any,
+) -> None:
+    async def run_item(entry: tuple[int, Any]) -> ItemResult:
+        index, item = entry
+        start = time.monotonic_ns()
+        try:
+            output = func(**item) if isinstance(item, dict) else func(item)
+            if inspect.isawaitable(output):
+                output = await output
+            # outputs cross the process boundary and end up in the report as JSON
+            result = ItemResult(index, output=_jsonable(output), worker=worker)
+        except Exception:
+            result = ItemResult(index, error=traceback.format_exc(), worker=worker)
+        result.duration_ns = time.monotonic_ns() - start
+        results.put(result)
+        return result
+
+    # deferred hooks have all seen their results by the time the shard is reported done
+    async with DeferredHooks():
+        with provide(hooks=hooks, mocks=mocks):
+            await fanout.bounded_map(run_item, shard, concurrency=concurrency)
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return repr(value)
+    return value
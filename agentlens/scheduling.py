@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import heapq
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Generic, Hashable, TypeVar
+
+from agentlens.metrics import LatencyHistogram
+
+T = TypeVar("T", bound=Hashable)
+
+DEFAULT_STARVATION_TIMEOUT_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class Priority:
+    """Scheduling class of model calls, provided as a context or passed per call
+
+    Waiting calls with a higher `level` are admitted first, e.g. `Priority(level=1)` for
+    interactive traffic and `Priority(level=-1)` for background evals. Within a level,
+    `tenant`s share connection slots in proportion to their `weight`.
+    """
+
+    level: int = 0
+    tenant: str = "default"
+    weight: float = 1.0
+
+    def __post_init__(self):
+        if self.weight <= 0:
+            raise ValueError(f"Priority weight must be positive, got {self.weight}")
+
+
+DEFAULT_PRIORITY = Priority()
+
+
+@dataclass
+class QueueStats:
+    """Queue depth and wait times of one priority level"""
+
+    depth: int = 0
+    max_depth: int = 0
+    admitted: int = 0
+    promoted: int = 0
+    """Waiters admitted ahead of higher levels by starvation protection"""
+    wait: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("tag", "seq", "enqueued_ns", "item", "level", "live")
+
+    def __init__(self, tag: float, seq: int, item: T, level: int):
+        self.tag = tag
+        self.seq = seq
+        self.enqueued_ns = time.monotonic_ns()
+        self.item = item
+        self.level = level
+        self.live = True
+
+    def __lt__(self, other: _Entry[T]) -> bool:
+        return (self.tag, self.seq) < (other.tag, other.seq)
+
+
+class _Level(Generic[T]):
+    __slots__ = ("heap", "arrivals", "virtual_time", "finish_tags", "size")
+
+    def __init__(self) -> None:
+        self.heap: list[_Entry[T]] = []
+        self.arrivals: deque[_Entry[T]] = deque()
+        self.virtual_time = 0.0
+        self.finish_tags: dict[str, float] = {}
+        self.size = 0
+
+    def oldest(self) -> _Entry[T] | None:
+        while self.arrivals and not self.arrivals[0].live:
+            self.arrivals.popleft()
+        return self.arrivals[0] if self.arrivals else None
+
+    def next(self) -> _Entry[T]:
+        while not self.heap[0].live:
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def compact(self) -> None:
+        """Drop withdrawn entries once they outnumber the live ones"""
+        if len(self.heap) > 2 * self.size:
+            self.heap = [entry for entry in self.heap if entry.live]
+            heapq.heapify(self.heap)
+        if len(self.arrivals) > 2 * self.size:
+            self.arrivals = deque(entry for entry in self.arrivals if entry.live)
+
+
+class FairQueue(Generic[T]):
+    """Wait queue ordered by priority level, then weighted fair share between tenants
+
+    Higher levels are always served first, except that a waiter queued for longer than
+    `starvation_timeout` seconds is admitted next whatever its level. Within a level,
+    each tenant's waiters are stamped with virtual finish times that advance by
+    `1 / weight`, so busy tenants get slots in proportion to their weights and an idle
+    tenant cannot bank credit.
+    """
+
+    def __init__(self, starvation_timeout: float | None = DEFAULT_STARVATION_TIMEOUT_SECONDS):
+        self.starvation_timeout = starvation_timeout
+        self.stats: dict[int, QueueStats] = {}
+        self._levels: dict[int, _Level[T]] = {}
+        self._entries: dict[T, _Entry[T]] = {}
+        self._seq = count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._entries
+
+    def _stats(self, level: int) -> QueueStats:
+        stats = self.stats.get(level)
+        if stats is None:
+            stats = self.stats[level] = QueueStats()
+        return stats
+
+    def admitted(self, priority: Priority, wait_ns: int = 0) -> None:
+        """Record an admission that did not have to queue"""
+        stats = self._stats(priority.level)
+        stats.admitted += 1
+        stats.wait.record(wait_ns)
+
+    def push(self, item: T, priority: Priority) -> None:
+        level = self._levels.get(priority.level)
+        if level is None:
+            level = self._levels[priority.level] = _Level()
+        start = max(level.virtual_time, level.finish_tags.get(priority.tenant, 0.0))
+        tag = start + 1 / priority.weight
+        level.finish_tags[priority.tenant] = tag
+
+        entry = _Entry(tag, next(self._seq), item, priority.level)
+        heapq.heappush(level.heap, entry)
+        if self.starvation_timeout is not None:
+            level.arrivals.append(entry)
+        level.size += 1
+        self._entries[item] = entry
+
+        stats = self._stats(priority.level)
+        stats.depth += 1
+        stats.max_depth = max(stats.max_depth, stats.depth)
+
+    def pop(self) -> T:
+        """Remove and return the next waiter to admit"""
+        if not self._entries:
+            raise IndexError("pop from an empty FairQueue")
+        top = max(self._levels)
+        entry = self._starved()
+        promoted = entry is not None and entry.level != top
+        if entry is None:
+            entry = self._levels[top].next()
+
+        level = self._levels[entry.level]
+        level.virtual_time = max(level.virtual_time, entry.tag)
+        self._discard(entry)
+        stats = self._stats(entry.level)
+        stats.admitted += 1
+        stats.promoted += promoted
+        stats.wait.record(time.monotonic_ns() - entry.enqueued_ns)
+        return entry.item
+
+    def remove(self, item: T) -> None:
+        """Withdraw a waiter, e.g. one that was cancelled"""
+        entry = self._entries.get(item)
+        if entry is None:
+            raise ValueError("item is not queued")
+        self._discard(entry)
+
+    def _starved(self) -> _Entry[T] | None:
+        if self.starvation_timeout is None:
+            return None
+        deadline = time.monotonic_ns() - int(self.starvation_timeout * 1e9)
+        oldest: _Entry[T] | None = None
+        for level in self._levels.values():
+            entry = level.oldest()
+            if entry is not None and (oldest is None or entry.enqueued_ns < oldest.enqueued_ns):
+                oldest = entry
+        return oldest if oldest is not None and oldest.enqueued_ns <= deadline else None
+
+    def _discard(self, entry: _Entry[T]) -> None:
+        entry.live = False
+        del self._entries[entry.item]
+        self._stats(entry.level).depth -= 1
+        level = self._levels[entry.level]
+        level.size -= 1
+        if not level.size:
+            # an idle level starts over, dropping stale entries and tenants
+            del self._levels[entry.level]
+        else:
+            level.compact()
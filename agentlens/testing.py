@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from itertools import count
+from typing import Any, Callable, Type
+
+from pydantic import BaseModel
+
+from agentlens.batch import BatchRequest
+from agentlens.inference import Message, ModelProvider, T, report_usage
+
+
+def echo(messages: list[Message]) -> str:
+    """Text of the last message"""
+    content = messages[-1].content
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(getattr(item, "text", "") for item in content)
+    return getattr(content, "text", "")
+
+
+class FakeProvider(ModelProvider):
+    """Offline provider that answers every request with `respond(messages)`
+
+    Objects are parsed from the response as JSON. The first `failures` calls raise a
+    ConnectionError, and `usage` is reported as (input, output) tokens when given.
+    Batch jobs complete `batch_latency` seconds after submission, and every submitted
+    batch is kept in `batches` so tests can inspect how calls were grouped.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[list[Message]], str] = echo,
+        latency: float = 0.0,
+        batch_latency: float = 0.0,
+        failures: int = 0,
+        usage: tuple[int, int] | None = None,
+        name: str = "fake",
+        **kwargs: Any,
+    ):
+        super().__init__(name, **kwargs)
+        self.respond = respond
+        self.latency = latency
+        self.batch_latency = batch_latency
+        self.failures = failures
+        self.usage = usage
+        self.calls = 0
+        self.batches: dict[str, list[BatchRequest]] = {}
+        self._batch_ids = count(1)
+        self._ready_at: dict[str, float] = {}
+
+    async def _respond(self, messages: list[Message]) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.calls <= self.failures:
+            raise ConnectionError("flaky")
+        if self.usage is not None:
+            report_usage(*self.usage)
+        return self.respond(messages)
+
+    async def generate_text(
+        self,
+        *,
+        model: str,
+        messages: list[Message],
+        max_tokens: int | None = None,
+        temperature: float | None = None,
+    ) -> str:
+        return await self._respond(messages)
+
+    async def generate_object(
+        self,
+        *,
+        model: str,
+        messages: list[Message],
+        schema: Type[T],
+        max_tokens: int | None = None,
+        temperature: float | None = None,
+    ) -> T:
+        response = await self._respond(messages)
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            return schema.model_validate_json(response)
+        return json.loads(response)  # a JSON-schema dict
+
+    async def submit_batch(self, requests: list[BatchRequest]) -> str:
+        batch_id = f"batch-{next(self._batch_ids)}"
+        self.batches[batch_id] = requests
+        self._ready_at[batch_id] = time.monotonic() + self.batch_latency
+        return batch_id
+
+    async def poll_batch(self, batch_id: str) -> dict[str, Any] | None:
+        if time.monotonic() < self._ready_at[batch_id]:
+            return None
+        results: dict[str, Any] = {}
+        for request in self.batches[batch_id]:
+            generate = getattr(self, request.kind)
+            try:
+                results[request.custom_id] = await generate(
+                    model=request.model, messages=request.messages, **request.params
+                )
+            except Exception as e:
+                results[request.custom_id] = e
+        return results
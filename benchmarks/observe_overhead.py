@@ -0,0 +1,45 @@
+"""Per-call overhead of the ``observe`` wrapper relative to a bare coroutine.
+
+Usage: python benchmarks/observe_overhead.py [n_calls]
+"""
+
+import asyncio
+import sys
+import time
+
+import agentlens.evaluation as ev
+from agentlens.client import observe, provide
+
+
+async def bare(a: int, b: int = 1) -> int:
+    return a + b
+
+
+observed = observe(bare)
+
+
+@ev.hook(observed)
+def passthrough_hook(a: int) -> ev.Hook[int]:
+    yield {}
+
+
+async def _time(fn, n: int) -> float:
+    start = time.perf_counter_ns()
+    for i in range(n):
+        await fn(i, b=2)
+    return (time.perf_counter_ns() - start) / n
+
+
+async def main(n: int) -> None:
+    baseline = await _time(bare, n)
+    fast = await _time(observed, n)
+    with provide(hooks=[passthrough_hook]):
+        hooked = await _time(observed, n)
+
+    print(f"bare coroutine:        {baseline:10.0f} ns/call")
+    print(f"observe (fast path):   {fast:10.0f} ns/call  (+{fast - baseline:.0f})")
+    print(f"observe (with hook):   {hooked:10.0f} ns/call  (+{hooked - baseline:.0f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
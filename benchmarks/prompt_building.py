@@ -0,0 +1,66 @@
+"""Cost of rendering a large nested prompt into messages, cold and cached.
+
+Usage: python benchmarks/prompt_building.py [n_calls]
+"""
+
+import sys
+import time
+
+import agentlens.inference as inference
+from agentlens.inference import Message, TextContent, format_prompt, system_message
+
+
+def _paragraph(i: int) -> str:
+    return f"""
+        Guideline {i}: answer precisely, cite the relevant section of the source
+        document and never speculate beyond what the context supports.
+    """
+
+
+def build_prompt(sections: int = 40, rules: int = 12) -> dict:
+    """A ~75 KB system prompt of nested sections, like an agent's static instructions"""
+    return {
+        "role": "You are a meticulous research assistant.",
+        "instructions": {
+            f"section_{s}": {f"rule_{r}": _paragraph(s * rules + r) for r in range(rules)}
+            for s in range(sections)
+        },
+        "output_format": "Respond in JSON matching the provided schema.",
+    }
+
+
+def _time(fn, n: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - start) / n
+
+
+def _clear_caches() -> None:
+    inference._render_prompt.cache_clear()
+    inference._dedent.cache_clear()
+
+
+def main(n: int) -> None:
+    prompt = build_prompt()
+    text = format_prompt(prompt)
+
+    def cold():
+        _clear_caches()
+        system_message(prompt)
+
+    cold_ns = _time(cold, n)
+    _clear_caches()
+    warm_ns = _time(lambda: system_message(prompt), n)
+    validated_ns = _time(lambda: Message(role="system", content=TextContent(text=text).text), n)
+    trusted_ns = _time(lambda: Message.trusted("system", text), n)
+
+    print(f"prompt size:                 {len(text) / 1024:10.1f} KB")
+    print(f"system_message (uncached):   {cold_ns / 1000:10.1f} us/call")
+    print(f"system_message (cached):     {warm_ns / 1000:10.1f} us/call")
+    print(f"Message (validated):         {validated_ns / 1000:10.1f} us/call")
+    print(f"Message.trusted:             {trusted_ns / 1000:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000)
@@ -7,3 +7,7 @@ class Counter(BaseModel):
 
 class Messages(BaseModel):
     items: list[str] = []
+
+
+class Echo(BaseModel):
+    text: str
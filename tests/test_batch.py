@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from agentlens.batch import BatchError, BatchMode, BatchRequest
+from agentlens.cache import ResponseCache
+from agentlens.client import provide
+from agentlens.inference import generate_object, generate_text
+from agentlens.testing import FakeProvider
+from tests.conftest import Echo
+
+
+async def test_calls_are_flushed_as_one_batch_by_size():
+    provider = FakeProvider(batch_latency=0.01)
+    batch_mode = BatchMode(max_batch_size=3, max_wait=60, poll_interval=0.005)
+
+    with provide(batch_mode):
+        results = await asyncio.gather(
+            *(generate_text(provider / "m", prompt=f"hello {i}") for i in range(3))
+        )
+
+    assert results == ["hello 0", "hello 1", "hello 2"]
+    assert provider.calls == 3
+    (batch,) = provider.batches.values()
+    assert [request.kind for request in batch] == ["generate_text"] * 3
+    assert batch_mode.submitted_batches == 1
+
+
+async def test_partial_batch_is_flushed_after_the_window():
+    provider = FakeProvider()
+    batch_mode = BatchMode(max_batch_size=100, max_wait=0.02, poll_interval=0.005)
+
+    with provide(batch_mode):
+        result = await asyncio.wait_for(generate_text(provider / "m", prompt="hi"), 1)
+
+    assert result == "hi"
+    assert len(provider.batches) == 1
+
+
+async def test_batches_are_grouped_per_model():
+    provider = FakeProvider()
+    batch_mode = BatchMode(max_batch_size=100, max_wait=60, poll_interval=0.005)
+
+    with provide(batch_mode):
+        calls = [
+            asyncio.ensure_future(generate_text(provider / model, prompt=model))
+            for model in ("a", "b", "a")
+        ]
+        await asyncio.sleep(0)
+        batch_mode.flush()
+        results = await asyncio.gather(*calls)
+
+    assert results == ["a", "b", "a"]
+    assert sorted(len(batch) for batch in provider.batches.values()) == [1, 2]
+
+
+async def test_structured_results_and_errors_reach_their_callers():
+    provider = FakeProvider()
+    batch_mode = BatchMode(max_batch_size=2, poll_interval=0.005)
+
+    with provide(batch_mode):
+        ok, bad = await asyncio.gather(
+            generate_object(provider / "m", schema=Echo, prompt='{"text": "ok"}', max_retries=1),
+            generate_object(provider / "m", schema=Echo, prompt="not json", max_retries=1),
+            return_exceptions=True,
+        )
+
+    assert ok == Echo(text="ok")
+    assert isinstance(bad, ValueError)
+
+
+async def test_missing_result_raises_batch_error():
+    class LossyProvider(FakeProvider):
+        async def poll_batch(self, batch_id):
+            return {}
+
+    batch_mode = BatchMode(max_batch_size=1, poll_interval=0.005)
+    with provide(batch_mode):
+        with pytest.raises(BatchError):
+            await generate_text(LossyProvider() / "m", prompt="hi")
+
+
+async def test_batched_responses_are_cached():
+    provider = FakeProvider()
+    batch_mode = BatchMode(max_batch_size=1, poll_interval=0.005)
+
+    with provide(batch_mode, ResponseCache()):
+        assert await generate_text(provider / "m", prompt="hi") == "hi"
+        assert await generate_text(provider / "m", prompt="hi") == "hi"
+
+    assert len(provider.batches) == 1
+
+
+async def test_drain_waits_for_queued_requests():
+    provider = FakeProvider(batch_latency=0.01)
+    batch_mode = BatchMode(max_batch_size=100, max_wait=60, poll_interval=0.005)
+    request = BatchRequest(kind="generate_text", model="m", messages=[])
+
+    with provide(batch_mode):
+        pending = asyncio.ensure_future(batch_mode.submit(provider, request))
+        await asyncio.sleep(0)
+        await batch_mode.drain()
+
+    assert pending.done()
+    assert isinstance(pending.exception(), IndexError)  # echo of an empty conversation
@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+from agentlens.cache import ResponseCache, SingleFlight, request_fingerprint
+from agentlens.client import Observation, observe, provide, use
+from agentlens.inference import (
+    Message,
+    MessagePrefix,
+    PrefixedMessages,
+    generate_object,
+    generate_text,
+)
+from agentlens.testing import FakeProvider
+from tests.conftest import Echo
+
+
+async def test_cache_hit_skips_provider_and_is_observed():
+    provider = FakeProvider()
+
+    @observe
+    async def ask(prompt: str):
+        await generate_text(provider / "m", prompt=prompt)
+        return use(Observation)
+
+    with provide(ResponseCache()):
+        first = await ask("hello")
+        second = await ask("hello")
+        await ask("different")
+
+    assert provider.calls == 2
+    assert first.children[0].cache_status == "miss"
+    assert second.children[0].cache_status == "hit"
+    assert second.children[0].network_ns == 0
+
+
+async def test_cache_round_trips_objects_and_dicts():
+    provider = FakeProvider()
+    with provide(ResponseCache()):
+        for _ in range(2):
+            result = await generate_object(provider / "m", schema=Echo, prompt='{"text": "hi"}')
+            assert isinstance(result, Echo) and result.text == "hi"
+    assert provider.calls == 1
+
+
+async def test_disk_tier_survives_restart(tmp_path):
+    provider = FakeProvider()
+    path = tmp_path / "cache.sqlite"
+
+    with provide(ResponseCache(path)):
+        await generate_text(provider / "m", prompt="hello", temperature=0.0)
+    with provide(ResponseCache(path)):
+        assert await generate_text(provider / "m", prompt="hello", temperature=0.0) == "hello"
+        # a different temperature is a different request
+        await generate_text(provider / "m", prompt="hello", temperature=1.0)
+    assert provider.calls == 2
+
+
+def test_cache_ttl_and_disk_bound(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_disk_entries=5)
+    for i in range(20):
+        cache.set(f"k{i}", "v")
+    assert cache._count_disk_entries() <= 6
+    assert cache.get("k19") == "v"
+
+    expiring = ResponseCache(ttl=0.01)
+    expiring.set("k", "v")
+    time.sleep(0.02)
+    assert expiring.get("k") is None
+
+
+def test_disk_hits_save_access_times_in_batches(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    writer = ResponseCache(path)
+    writer.set("k", "v")
+    writer.close()
+
+    cache = ResponseCache(path, max_memory_entries=0)
+    (written_at,) = cache._db.execute("SELECT accessed_at FROM responses").fetchone()
+    assert cache.get("k") == "v"
+    assert not cache._db.in_transaction  # the hit itself wrote nothing
+    cache.close()
+
+    reopened = ResponseCache(path)
+    (accessed_at,) = reopened._db.execute("SELECT accessed_at FROM responses").fetchone()
+    assert accessed_at > written_at
+
+
+async def test_single_flight_coalesces_concurrent_duplicates():
+    provider = FakeProvider(latency=0.02)
+
+    @observe
+    async def ask():
+        await generate_object(provider / "m", schema=Echo, prompt='{"text": "plan"}')
+        return use(Observation)
+
+    single_flight = SingleFlight()
+    with provide(single_flight):
+        observations = await asyncio.gather(*(ask() for _ in range(5)))
+
+    assert provider.calls == 1
+    assert single_flight.coalesced == 4 and single_flight.in_flight == 0
+    assert sorted(o.children[0].coalesced for o in observations) == [False] + [True] * 4
+
+
+async def test_single_flight_propagates_errors_and_cancellation():
+    single_flight = SingleFlight()
+    started = 0
+
+    async def fail():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *(single_flight.run("k", fail) for _ in range(3)), return_exceptions=True
+    )
+    assert started == 1
+    assert all(isinstance(r, ValueError) for r in results)
+
+    # the shared call survives one caller cancelling, and is cancelled with the last
+    gate = asyncio.Event()
+
+    async def slow():
+        await gate.wait()
+        return "done"
+
+    first = asyncio.create_task(single_flight.run("slow", slow))
+    second = asyncio.create_task(single_flight.run("slow", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+    gate.set()
+    assert await second == ("done", True)
+
+    gate.clear()
+    lone = asyncio.create_task(single_flight.run("lone", slow))
+    await asyncio.sleep(0)
+    lone.cancel()
+    await asyncio.sleep(0)
+    assert single_flight.in_flight == 0
+
+
+def test_fingerprint_hashes_shared_prefix_once():
+    prefix = MessagePrefix(Message.system("long context"))
+    first = request_fingerprint("text", "m", PrefixedMessages(prefix, [Message.user("a")]))
+    second = request_fingerprint("text", "m", PrefixedMessages(prefix, [Message.user("b")]))
+    assert first != second
+    assert prefix._fingerprint is not None
+    other = MessagePrefix(Message.system("other context"))
+    assert first != request_fingerprint("text", "m", PrefixedMessages(other, [Message.user("a")]))
@@ -0,0 +1,70 @@
+from pydantic import BaseModel
+
+from agentlens.cassette import Cassette, call_key
+from agentlens.client import Observation, observe, provide, use
+from agentlens.inference import generate_text
+from agentlens.testing import FakeProvider
+
+calls: list[str] = []
+
+
+class Query(BaseModel):
+    text: str
+
+
+@observe
+async def answer(query: Query, shout: bool = False) -> str:
+    calls.append(query.text)
+    return query.text.upper() if shout else query.text
+
+
+async def test_record_then_replay_observed_calls(tmp_path):
+    calls.clear()
+    path = tmp_path / "run.cassette"
+    with Cassette(path, mode="record") as recording, provide(recording):
+        assert await answer(Query(text="hi"), shout=True) == "HI"
+    assert calls == ["hi"]
+
+    cassette = Cassette(path, mode="replay")
+
+    @observe
+    async def run(text: str) -> Observation:
+        await answer(Query(text=text), shout=True)
+        return use(Observation)
+
+    with provide(cassette):
+        replayed = await run("hi")
+        await run("unseen")
+
+    assert calls == ["hi", "unseen"]  # only the unseen input ran live
+    assert replayed.children[0].cache_status == "replay"
+    assert cassette.hits == 1 and cassette.recorded == 0
+
+
+async def test_auto_mode_records_misses(tmp_path):
+    calls.clear()
+    cassette = Cassette(tmp_path / "auto.cassette")
+    with provide(cassette):
+        await answer(Query(text="a"))
+        await answer(Query(text="a"))
+    assert calls == ["a"]
+    assert cassette.recorded == 1
+    assert cassette._db is not None and cassette._db.in_transaction  # not committed per call
+    cassette.close()
+
+
+async def test_model_responses_are_replayed_at_the_provider_boundary(tmp_path):
+    path = tmp_path / "models.cassette"
+    provider = FakeProvider()
+    with Cassette(path, mode="record") as recording, provide(recording):
+        assert await generate_text(provider / "m", prompt="hello") == "hello"
+
+    offline = FakeProvider(failures=100)
+    with provide(Cassette(path, mode="replay")):
+        assert await generate_text(offline / "m", prompt="hello") == "hello"
+    assert offline.calls == 0
+
+
+def test_inputs_without_stable_encoding_have_no_key():
+    assert call_key(answer, {"query": Query(text="x"), "shout": True}) is not None
+    assert call_key(answer, {"query": object()}) is None
@@ -101,3 +101,45 @@ async def test_mutate_parent_through_reference():
         # The child added 10 to the parent's counter
         assert val == 10
         assert parent_counter.value == 10
+
+
+@pytest.mark.asyncio
+async def test_context_stack_frames_are_shared_and_inherited():
+    import asyncio
+
+    from agentlens.context import ContextStack
+
+    stack = ContextStack[int]("test_stack")
+    with stack.push({"a": 1}) as bottom:
+        with stack.push({"a": 2}):
+            assert stack.depth == 2
+            assert stack.stack[0] is bottom
+            assert stack.current == {"a": 2}
+
+            async def child() -> dict[str, int] | None:
+                with stack.push({"a": 3}):
+                    pass
+                return stack.current
+
+            # child tasks inherit the frame, and their pushes do not leak back
+            assert await asyncio.create_task(child()) == {"a": 2}
+            assert stack.depth == 2
+        assert stack.current is bottom
+    assert stack.current is None and stack.stack == []
+
+
+def test_scope_map_shares_parent_and_flattens():
+    from agentlens.context import EMPTY_SCOPE, ScopeMap
+
+    base = EMPTY_SCOPE.update({"a": 1, "b": 2})
+    child = base.set("a", 10)
+    assert child["a"] == 10 and child["b"] == 2
+    assert base["a"] == 1
+    assert base.update({}) is base
+
+    scope = child
+    for i in range(ScopeMap.MAX_CHAIN * 3):
+        scope = scope.set(f"k{i}", i)
+    assert dict(scope) == {"a": 10, "b": 2, **{f"k{i}": i for i in range(24)}}
+    assert "k23" in scope and "missing" not in scope
+    assert scope.get("missing") is None
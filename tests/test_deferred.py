@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+import agentlens.evaluation as ev
+from agentlens.client import observe, provide
+from agentlens.deferred import DeferredHooks
+
+
+@observe
+async def answer(question: str) -> str:
+    return question.upper()
+
+
+async def test_deferred_hooks_run_after_the_task_returns():
+    scores: list[str] = []
+
+    @ev.hook(answer, deferred=True)
+    async def judge(question: str) -> ev.AsyncHook[str]:
+        result = yield None
+        await asyncio.sleep(0.05)  # e.g. an LLM-as-judge call
+        scores.append(result)
+
+    @ev.hook(answer)
+    def inline(question: str) -> ev.Hook[str]:
+        result = yield None
+        scores.append(f"inline:{result}")
+
+    async with DeferredHooks() as deferred:
+        start = time.monotonic()
+        with provide(hooks=[judge, inline]):
+            results = await asyncio.gather(*(answer(q) for q in ("a", "b", "c")))
+        assert time.monotonic() - start < 0.05
+        assert scores == ["inline:A", "inline:B", "inline:C"]
+        assert deferred.pending == 3
+
+    # leaving the block drains the queue
+    assert results == ["A", "B", "C"]
+    assert sorted(scores[3:]) == ["A", "B", "C"]
+    assert deferred.completed == 3
+
+
+async def test_backpressure_bounds_pending_hooks():
+    release = asyncio.Event()
+
+    @ev.hook(answer, deferred=True)
+    async def slow(question: str) -> ev.AsyncHook[str]:
+        yield None
+        await release.wait()
+
+    deferred = DeferredHooks(workers=1, max_pending=2)
+    with provide(deferred, hooks=[slow]):
+        calls = [asyncio.create_task(answer(q)) for q in "abcd"]
+        await asyncio.sleep(0.01)
+        peak = deferred.pending
+        finished = sum(call.done() for call in calls)
+        release.set()
+        await asyncio.gather(*calls)
+        await deferred.drain()
+
+    assert peak == 2
+    assert finished == 2  # the others waited for room in the queue
+    assert deferred.completed == 4
+
+
+async def test_deferred_hook_failures_are_kept_not_raised():
+    @ev.hook(answer, deferred=True)
+    def broken(question: str) -> ev.Hook[str]:
+        yield None
+        raise RuntimeError("scoring failed")
+
+    async with DeferredHooks() as deferred:
+        with provide(hooks=[broken]):
+            assert await answer("x") == "X"
+
+    assert [str(e) for e in deferred.errors] == ["scoring failed"]
+
+
+async def test_deferred_hooks_run_inline_without_context():
+    seen: list[str] = []
+
+    @ev.hook(answer, deferred=True)
+    def record(question: str) -> ev.Hook[str]:
+        seen.append((yield None))
+
+    with provide(hooks=[record]):
+        await answer("x")
+    assert seen == ["X"]
+
+    with pytest.raises(ValueError):
+        DeferredHooks(workers=2, max_pending=1)
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from agentlens.client import observe, provide
+from agentlens.export import (
+    BinarySink,
+    JsonlSink,
+    Span,
+    SpanExporter,
+    SpanSink,
+    read_binary_spans,
+)
+
+
+@observe
+async def child():
+    return "child"
+
+
+@observe
+async def failing_child():
+    raise ValueError("boom")
+
+
+@observe
+async def parent():
+    await child()
+    with pytest.raises(ValueError):
+        await failing_child()
+    return "parent"
+
+
+async def test_jsonl_exporter_streams_completed_spans(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    with SpanExporter(JsonlSink(path), batch_size=2) as exporter:
+        with provide(exporter):
+            await parent()
+        await exporter.flush()
+        spans = [json.loads(line) for line in path.read_text().splitlines()]
+
+    # children finish (and are exported) before their parent
+    assert [s["name"] for s in spans] == ["child", "failing_child", "parent"]
+    assert spans[0]["parent_id"] == spans[2]["id"]
+    assert spans[1]["error"] == "ValueError: boom"
+    assert spans[2]["parent_id"] is None and spans[2]["error"] is None
+    assert {s["process_id"] for s in spans} == {os.getpid()}
+
+
+async def test_binary_exporter_round_trip(tmp_path):
+    path = tmp_path / "spans.bin"
+    exporter = SpanExporter(BinarySink(path))
+    with provide(exporter):
+        await parent()
+    exporter.close()
+
+    spans = list(read_binary_spans(path))
+    assert [s.name for s in spans] == ["child", "failing_child", "parent"]
+    assert spans[1].error == "ValueError: boom"
+    assert spans[2].parent_id is None
+    assert spans[2].process_id == os.getpid()
+    assert all(s.end_ns >= s.start_ns for s in spans)
+
+
+class SlowSink(SpanSink):
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def write(self, spans: list[Span]) -> None:
+        time.sleep(0.02)
+        self.spans.extend(spans)
+
+
+async def test_blocking_export_waits_without_stalling_the_loop():
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    sink = SlowSink()
+    ticking = asyncio.create_task(ticker())
+    with SpanExporter(sink, batch_size=1, max_queue_size=1, on_full="block") as exporter:
+        with provide(exporter):
+            await asyncio.gather(*(child() for _ in range(5)))
+        await exporter.flush()
+        ticking.cancel()
+
+    assert len(sink.spans) == 5 and exporter.dropped == 0
+    assert ticks >= 5  # the loop kept running while the writer caught up
+
+
+async def test_spans_carry_wall_clock_timestamps(tmp_path):
+    before = time.time_ns()
+    with SpanExporter(JsonlSink(tmp_path / "spans.jsonl")) as exporter:
+        with provide(exporter):
+            await child()
+        await exporter.flush()
+    (span,) = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    assert before - 10**9 < span["start_ns"] <= span["end_ns"] < time.time_ns() + 10**9
+
+
+async def test_steady_trickle_is_written_within_the_flush_interval():
+    sink = SlowSink()
+    with SpanExporter(sink, flush_interval=0.05) as exporter:
+        with provide(exporter):
+            # never idle for a whole interval, and far below batch_size
+            for _ in range(8):
+                await child()
+                await asyncio.sleep(0.02)
+        assert exporter.exported > 0
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+import agentlens.evaluation as ev
+from agentlens import fanout
+from agentlens.client import Observation, observe, provide, use
+from tests.conftest import Counter
+
+
+@observe
+async def square(x: int) -> int:
+    await asyncio.sleep(0.001 * (x % 3))
+    return x * x
+
+
+async def test_map_bounds_concurrency_and_keeps_order():
+    in_flight = peak = 0
+
+    async def track(x: int) -> int:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            return await square(x)
+        finally:
+            in_flight -= 1
+
+    results = await fanout.bounded_map(track, range(20), concurrency=4)
+    assert results == [x * x for x in range(20)]
+    assert peak == 4
+
+
+async def test_inputs_are_consumed_lazily():
+    consumed: list[int] = []
+
+    def inputs():
+        for x in range(10):
+            consumed.append(x)
+            yield x
+
+    stream = fanout.as_completed(square, inputs(), concurrency=2)
+    await stream.__anext__()
+    assert len(consumed) <= 3
+    await stream.aclose()
+
+
+async def test_unordered_results_stream_as_they_finish():
+    async def wait(delay: float) -> float:
+        await asyncio.sleep(delay)
+        return delay
+
+    indices = [i async for i, _ in fanout.as_completed(wait, [0.03, 0.01, 0.02])]
+    assert indices == [1, 2, 0]
+
+
+async def test_first_error_cancels_siblings():
+    cancelled: list[int] = []
+
+    async def work(x: int) -> int:
+        if x == 0:
+            raise ValueError("boom")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(x)
+            raise
+        return x
+
+    with pytest.raises(ValueError, match="boom"):
+        await fanout.bounded_map(work, range(4), concurrency=4)
+    assert sorted(cancelled) == [1, 2, 3]
+
+
+async def test_errors_can_be_collected():
+    async def work(x: int) -> int:
+        if x % 2:
+            raise ValueError(x)
+        return x
+
+    results = await fanout.bounded_map(work, range(4), return_exceptions=True)
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], ValueError) and isinstance(results[3], ValueError)
+
+
+async def test_children_inherit_contexts_hooks_and_mocks():
+    @observe
+    async def count(x: int) -> int:
+        use(Counter).value += 1
+        return x
+
+    @ev.hook(count)
+    def add_one(x: int) -> ev.Hook[int]:
+        yield {"x": x + 1}
+
+    @ev.mock(square)
+    async def fake_square(x: int) -> int:
+        return -x
+
+    @observe
+    async def parent() -> tuple[list[int], list[int], Observation]:
+        counted = await fanout.bounded_map(count, range(5), concurrency=2)
+        squared = await fanout.bounded_map(square, range(3))
+        return counted, squared, use(Observation)
+
+    counter = Counter()
+    with provide(counter, hooks=[add_one], mocks=[fake_square]):
+        counted, squared, root = await parent()
+
+    assert counted == [1, 2, 3, 4, 5]
+    assert squared == [0, -1, -2]
+    assert counter.value == 5
+    assert [child.name for child in root.children] == ["count"] * 5 + ["square"] * 3
@@ -1,3 +1,9 @@
+import asyncio
+import gc
+import inspect
+import time
+import weakref
+
 import pytest
 
 import agentlens.evaluation as ev
@@ -91,3 +97,236 @@ async def test_hook_partial_params():
     with provide(hooks=[hook_partial]):
         result = await combine_strings("abc", "def")
         assert result == "ABC-def"
+
+
+async def test_hook_input_param_and_defaults():
+    @observe
+    async def greet_with_greeting(name: str, greeting: str = "Hello") -> str:
+        return f"{greeting}, {name}"
+
+    seen: list[dict] = []
+
+    @ev.hook(greet_with_greeting)
+    def hook_capture_input(input: dict) -> ev.Hook[str]:
+        seen.append(input)
+        yield {}
+
+    @ev.hook(greet_with_greeting)
+    def hook_capture_greeting(greeting: str) -> ev.Hook[str]:
+        seen.append({"greeting": greeting})
+        yield {}
+
+    with provide(hooks=[hook_capture_input, hook_capture_greeting]):
+        assert await greet_with_greeting("Alice") == "Hello, Alice"
+    assert seen == [{"name": "Alice", "greeting": "Hello"}, {"greeting": "Hello"}]
+
+
+async def test_nested_hooks_do_not_leak_into_parent_scope():
+    calls: list[str] = []
+
+    @ev.hook(greet_person)
+    def hook_outer(name: str) -> ev.Hook[str]:
+        calls.append("outer")
+        yield {}
+
+    @ev.hook(greet_person)
+    def hook_inner(name: str) -> ev.Hook[str]:
+        calls.append("inner")
+        yield {}
+
+    with provide(hooks=[hook_outer]):
+        with provide(hooks=[hook_inner]):
+            await greet_person("Alice")
+        assert calls == ["outer", "inner"]
+
+        calls.clear()
+        await greet_person("Alice")
+        assert calls == ["outer"]
+
+
+def _make_task(prefix: str):
+    # two distinct tasks that share the name `run`
+    @observe
+    async def run(text: str) -> str:
+        return f"{prefix}:{text}"
+
+    return run
+
+
+async def test_hooks_and_mocks_target_functions_not_names():
+    first, second = _make_task("first"), _make_task("second")
+
+    @ev.hook(first)
+    def shout(text: str) -> ev.Hook[str]:
+        yield {"text": text.upper()}
+
+    @ev.mock(second)
+    async def mock_second(text: str) -> str:
+        return "mocked"
+
+    with provide(hooks=[shout], mocks=[mock_second]):
+        assert await first("hi") == "first:HI"
+        assert await second("hi") == "mocked"
+
+
+async def test_pattern_hooks_match_by_glob_and_predicate():
+    seen: list[str] = []
+
+    @ev.hook(match="*.combine_*")
+    def glob_hook(input) -> ev.Hook[str]:
+        seen.append(f"glob:{sorted(input)}")
+        yield None
+
+    @ev.hook(match=lambda fn: fn.__name__ == "greet_person")
+    def predicate_hook(name: str) -> ev.Hook[str]:
+        yield {"name": name + "?"}
+
+    with provide(hooks=[glob_hook, predicate_hook]):
+        assert await greet_person("Alice") == "Hello, Alice?"
+        assert await combine_strings("x", "y") == "x-y"
+
+    assert seen == ["glob:['a', 'b']"]
+
+    with pytest.raises(ValueError, match="not both"):
+        ev.hook(greet_person, match="*")
+
+
+async def test_async_hooks_run_concurrently_and_merge_in_hook_order():
+    events: list[str] = []
+
+    def slow_hook(suffix: str) -> ev.HookFn:
+        @ev.hook(greet_person)
+        async def add_suffix(name: str) -> ev.AsyncHook[str]:
+            await asyncio.sleep(0.05)
+            result = yield {"name": name + suffix}
+            await asyncio.sleep(0.05)
+            events.append(f"{suffix}:{result}")
+
+        return add_suffix
+
+    @ev.hook(greet_person)
+    def sync_hook(name: str) -> ev.Hook[str]:
+        result = yield None
+        events.append(f"sync:{result}")
+
+    start = time.monotonic()
+    with provide(hooks=[slow_hook("?"), sync_hook, slow_hook("!")]):
+        result = await greet_person("Alice")
+
+    # the last hook to inject `name` wins, however long each one took
+    assert result == "Hello, Alice!"
+    assert time.monotonic() - start < 0.15  # 0.2 if the four sleeps ran one by one
+    assert sorted(events) == ["!:Hello, Alice!", "?:Hello, Alice!", "sync:Hello, Alice!"]
+
+
+async def test_async_hook_sees_task_error():
+    seen: list[Exception] = []
+
+    @observe
+    async def fail(x: int) -> int:
+        raise ValueError("boom")
+
+    @ev.hook(fail)
+    async def record_error(x: int) -> ev.AsyncHook[int]:
+        try:
+            yield None
+        except ValueError as e:
+            seen.append(e)
+            raise
+
+    with provide(hooks=[record_error]):
+        with pytest.raises(ValueError, match="boom"):
+            await fail(1)
+    assert len(seen) == 1
+
+
+async def test_hooks_after_a_failed_pre_phase_are_not_started():
+    events: list[str] = []
+
+    @ev.hook(greet_person)
+    def first(name: str) -> ev.Hook[str]:
+        try:
+            yield None
+        finally:
+            events.append("first closed")
+
+    @ev.hook(greet_person)
+    def broken(name: str) -> ev.Hook[str]:
+        raise RuntimeError("broken")
+        yield None
+
+    @ev.hook(greet_person)
+    def later(name: str) -> ev.Hook[str]:
+        events.append("later started")
+        yield None
+
+    with provide(hooks=[first, broken, later]):
+        with pytest.raises(RuntimeError, match="broken"):
+            await greet_person("Alice")
+    assert events == ["first closed"]
+
+
+async def test_hooks_are_closed_when_entering_is_cancelled():
+    events: list[str] = []
+
+    @ev.hook(greet_person)
+    async def entered(name: str) -> ev.AsyncHook[str]:
+        try:
+            yield None
+        finally:
+            events.append("entered closed")
+
+    @ev.hook(greet_person)
+    async def cancelled(name: str) -> ev.AsyncHook[str]:
+        raise asyncio.CancelledError
+        yield None
+
+    with provide(hooks=[entered, cancelled]):
+        with pytest.raises(asyncio.CancelledError):
+            await greet_person("Alice")
+    assert events == ["entered closed"]
+
+
+async def test_resolved_tasks_are_not_kept_alive():
+    task = _make_task("temporary")
+    assert await task("x") == "temporary:x"
+
+    released = weakref.ref(inspect.unwrap(task))
+    del task
+    gc.collect()
+    assert released() is None
+
+
+async def test_kwargs_hooks_receive_inputs_by_name():
+    seen: list[dict] = []
+
+    @ev.hook(combine_strings)
+    def targeted(**kwargs) -> ev.Hook[str]:
+        seen.append(kwargs)
+        yield None
+
+    @ev.hook()
+    def global_hook(*args, **kwargs) -> ev.Hook[str]:
+        seen.append(kwargs)
+        yield None
+
+    with provide(hooks=[targeted, global_hook]):
+        await combine_strings("x", b="y")
+
+    # targeted hooks see bound parameter names, global hooks the raw call
+    assert seen == [{"a": "x", "b": "y"}, {"0": "x", "b": "y"}]
+
+
+def test_targeted_hooks_do_not_rebind_inputs(monkeypatch):
+    @ev.hook(combine_strings)
+    def whole_input(input: dict) -> ev.Hook[str]:
+        yield None
+
+    def rebind(*args, **kwargs):
+        raise AssertionError("inputs were bound again")
+
+    # dispatch hands targeted hooks inputs it has already bound
+    monkeypatch.setattr(inspect.Signature, "bind", rebind)
+    input_dict = {"a": "x", "b": "y"}
+    assert whole_input._build_kwargs((), input_dict) == {"input": input_dict}
+    assert hook_partial._build_kwargs((), input_dict) == {"a": "x"}
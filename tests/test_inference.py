@@ -0,0 +1,231 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+import agentlens.evaluation as ev
+from agentlens.client import Observation, observe, provide, use
+from agentlens.inference import (
+    Message,
+    MessagePrefix,
+    PrefixedMessages,
+    estimate_prompt_tokens,
+    format_prompt,
+    generate_object,
+    generate_text,
+    stream_object,
+    stream_text,
+)
+from agentlens.metrics import LatencyHistogram, MetricsAggregator
+from agentlens.testing import FakeProvider
+from tests.conftest import Echo
+
+
+async def test_generate_text_records_timings_and_usage():
+    provider = FakeProvider(latency=0.01, usage=(10, 2))
+
+    @observe
+    async def call_model():
+        await generate_text(provider / "m", prompt="hello")
+        return use(Observation)
+
+    root = await call_model()
+    (obs,) = root.children
+    assert obs.name == "generate_text"
+    assert obs.network_ns >= 10_000_000
+    assert obs.retries == 0
+    assert (obs.input_tokens, obs.output_tokens) == (10, 2)
+
+
+async def test_generate_object():
+    provider = FakeProvider()
+    result = await generate_object(provider / "m", schema=Echo, prompt='{"text": "hi"}')
+    assert result.text == "hi"
+
+
+async def test_metrics_aggregator_summarizes_tasks():
+    provider = FakeProvider(usage=(10, 2))
+    aggregator = MetricsAggregator()
+    with provide(aggregator):
+        for _ in range(3):
+            await generate_text(provider / "m", prompt="hello")
+
+    summary = aggregator.summary()["generate_text"]
+    assert summary["count"] == 3
+    assert summary["input_tokens"] == 30
+    assert summary["p50_ns"] is not None
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for value in range(1, 10_001):
+        histogram.record(value)
+    assert histogram.count == 10_000
+    assert histogram.min == 1 and histogram.max == 10_000
+    for p in (50, 90, 99):
+        expected = 10_000 * p / 100
+        assert abs(histogram.percentile(p) - expected) / expected < 0.05
+
+
+async def test_rate_limited_provider_reconciles_usage():
+    provider = FakeProvider(
+        usage=(10, 2), requests_per_minute={"m": 60}, tokens_per_minute={"m": 6_000}
+    )
+    prompt = "x" * 400
+    assert estimate_prompt_tokens([Message.user(prompt)]) == 104
+
+    await generate_text(provider / "m", prompt=prompt, max_tokens=100)
+    limiter = provider.get_rate_limiter("m")
+    assert limiter is not None and limiter.tokens is not None
+    # admitted on 204 estimated tokens, refunded down to the 12 reported
+    assert limiter.tokens.level > 6_000 - 20
+    assert provider.get_rate_limiter("other") is None
+
+
+class StreamingProvider(FakeProvider):
+    def __init__(self, chunks: list[str], gate: asyncio.Event | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.chunks = chunks
+        self.gate = gate
+
+    async def _stream(self) -> AsyncIterator[str]:
+        self.calls += 1
+        for i, chunk in enumerate(self.chunks):
+            if i and self.gate is not None:
+                await self.gate.wait()
+            yield chunk
+
+    def stream_text(self, *, model: str, messages: list[Message], **kwargs) -> AsyncIterator[str]:
+        return self._stream()
+
+
+async def test_stream_text_yields_chunks_and_records_first_token():
+    provider = StreamingProvider(["Hel", "lo"])
+
+    @observe
+    async def ask():
+        chunks = [chunk async for chunk in stream_text(provider / "m", prompt="hi")]
+        return chunks, use(Observation)
+
+    chunks, root = await ask()
+    assert chunks == ["Hel", "lo"]
+    (obs,) = root.children
+    assert obs.name == "stream_text"
+    assert obs.first_token_ns is not None and obs.first_token_ns <= obs.duration_ns
+
+
+async def test_stream_text_default_provider_hook_uses_generate_text():
+    provider = FakeProvider()
+    assert [c async for c in stream_text(provider / "m", prompt="whole")] == ["whole"]
+
+
+async def test_closing_stream_releases_slot():
+    gate = asyncio.Event()
+    provider = StreamingProvider(
+        ["a", "b"], gate=gate, max_connections_default=1, adaptive_concurrency=False
+    )
+    stream = stream_text(provider / "m", prompt="hi")
+    assert await stream.__anext__() == "a"
+    assert provider.get_semaphore("m").locked()
+
+    await stream.aclose()
+    await asyncio.sleep(0)
+    assert not provider.get_semaphore("m").locked()
+
+
+class Extraction(BaseModel):
+    title: str
+    items: list[Echo]
+
+
+class JsonStreamingProvider(StreamingProvider):
+    def stream_object(self, *, model: str, messages: list[Message], **kwargs):
+        return self._stream()
+
+
+async def test_stream_object_yields_partial_then_complete_objects():
+    document = '{"title": "Report", "items": [{"text": "first"}, {"text": "second"}]}'
+    provider = JsonStreamingProvider([document[i : i + 9] for i in range(0, len(document), 9)])
+
+    results = [r async for r in stream_object(provider / "m", schema=Extraction, prompt="go")]
+    *partials, final = results
+    assert isinstance(final, Extraction)
+    assert [item.text for item in final.items] == ["first", "second"]
+    assert partials and all(not isinstance(p, Extraction) for p in partials)
+    # earlier list items are available before the document is complete
+    assert any(p.items and p.items[0].text == "first" and len(p.items) == 1 for p in partials)
+
+
+async def test_stream_object_dict_schema_and_default_provider_hook():
+    provider = FakeProvider()
+    results = [r async for r in stream_object(provider / "m", schema=Echo, prompt='{"text": "hi"}')]
+    assert results[-1] == Echo(text="hi")
+
+    json_provider = JsonStreamingProvider(['{"a": [1, ', "2]}"])
+    results = [r async for r in stream_object(json_provider / "m", schema={"type": "object"})]
+    assert results == [{"a": [1]}, {"a": [1, 2]}, {"a": [1, 2]}]
+
+
+def test_format_prompt_renders_nested_dicts_by_content():
+    prompt = {"task": "  summarize  ", "context": {"doc": "\n    line one\n    line two\n"}}
+    expected = (
+        "<task>\nsummarize\n</task>\n<context>\n<doc>\nline one\nline two\n</doc>\n</context>"
+    )
+    assert format_prompt(prompt) == expected
+    assert format_prompt(prompt) is format_prompt(dict(prompt))
+
+    prompt["context"]["doc"] = "changed"
+    assert "changed" in format_prompt(prompt)
+    assert format_prompt({"empty": "", "nested": {}}) == ""
+
+
+def test_messages_skip_validation_only_for_well_formed_content():
+    message = Message.system({"rules": "be brief"}, Message.image_content("https://x/y.png"))
+    assert message == Message.model_validate(message.model_dump())
+    assert Message.trusted("user", "hi") == Message(role="user", content="hi")
+
+    with pytest.raises(ValidationError):
+        Message.message("narrator", "hi")  # type: ignore[arg-type]
+
+
+async def test_calls_share_a_message_prefix():
+    seen: list[list[Message]] = []
+
+    class RecordingProvider(FakeProvider):
+        async def generate_text(self, *, model: str, messages: list[Message], **kwargs) -> str:
+            seen.append(messages)
+            return await super().generate_text(model=model, messages=messages, **kwargs)
+
+    provider = RecordingProvider()
+    prefix = MessagePrefix.from_prompts(system={"rules": "be brief " * 100})
+    results = await asyncio.gather(
+        *(generate_text(provider / "m", prompt=f"q{i}", prefix=prefix) for i in range(3))
+    )
+
+    assert results == ["q0", "q1", "q2"]
+    for messages in seen:
+        assert isinstance(messages, PrefixedMessages) and messages.prefix is prefix
+        assert messages[0] is prefix.messages[0]
+        assert [m.content for m in messages.tail] == [messages[-1].content]
+    assert estimate_prompt_tokens(seen[0]) == estimate_prompt_tokens(list(seen[0]))
+
+    with pytest.raises(ValueError):
+        await generate_text(provider / "m", system="s", prefix=prefix)
+
+
+def test_hooks_and_mocks_on_unobserved_stream_functions_are_rejected():
+    @ev.hook(stream_text)
+    def shout(prompt: str) -> ev.Hook[str]:
+        yield {"prompt": prompt.upper()}
+
+    @ev.mock(stream_object)
+    async def canned(prompt: str) -> str:
+        return "{}"
+
+    with pytest.raises(ValueError, match="stream_text is not an observed task"):
+        with provide(hooks=[shout]):
+            pass
+    with pytest.raises(ValueError, match="stream_object is not an observed task"):
+        with provide(mocks=[canned]):
+            pass
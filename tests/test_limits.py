@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from agentlens.limits import (
+    AdaptiveLimiter,
+    RateLimiter,
+    TokenBucket,
+    is_overload_error,
+)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def test_is_overload_error():
+    assert is_overload_error(TimeoutError())
+    assert is_overload_error(RateLimitError())
+    error = Exception()
+    error.status_code = 429  # type: ignore[attr-defined]
+    assert is_overload_error(error)
+    assert not is_overload_error(ValueError("bad schema"))
+
+
+async def test_adaptive_limiter_bounds_concurrency():
+    limiter = AdaptiveLimiter(max_limit=3)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with limiter:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(*(work() for _ in range(20)))
+    assert peak == 3
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+async def test_adaptive_limiter_backs_off_and_recovers():
+    limiter = AdaptiveLimiter(max_limit=10, min_limit=2)
+    for _ in range(20):
+        limiter.record_overload()
+    assert limiter.limit == 2
+
+    # serial traffic does not use the limit, so it is not widened
+    for _ in range(50):
+        await limiter.acquire()
+        limiter.record_success(1_000)
+        limiter.release()
+    assert limiter.limit < 10
+
+    async def call():
+        async with limiter:
+            await asyncio.sleep(0.001)
+            limiter.record_success(1_000)
+
+    await asyncio.gather(*(call() for _ in range(300)))
+    assert limiter.limit == 10
+
+
+async def test_adaptive_limiter_cancelled_waiter_frees_slot():
+    limiter = AdaptiveLimiter(max_limit=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    limiter.release()
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+async def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(capacity=2, refill_per_second=100)
+    assert await bucket.acquire() == 0
+    assert await bucket.acquire() == 0
+    waited = await bucket.acquire()
+    assert 0 < waited <= 0.02
+
+    # charging for unexpected usage leaves the bucket in debt
+    bucket.adjust(5)
+    assert bucket.level < 0
+
+
+async def test_rate_limiter_reconciles_token_estimate():
+    limiter = RateLimiter(tokens_per_minute=1_000)
+    await limiter.acquire(estimated_tokens=500)
+    limiter.reconcile(estimated_tokens=500, actual_tokens=100)
+    assert limiter.tokens is not None and limiter.tokens.level > 850
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from agentlens.cache import ResponseCache
+from agentlens.client import Observation, observe, use
+from agentlens.memo import Memo
+
+
+class Document(BaseModel):
+    id: str
+    text: str
+
+
+async def test_repeated_calls_are_served_from_memo_and_still_observed():
+    runs: list[int] = []
+
+    @observe(memo=Memo())
+    async def chunk(text: str, size: int = 2) -> list[str]:
+        runs.append(size)
+        return [text[i : i + size] for i in range(0, len(text), size)]
+
+    @observe
+    async def pipeline() -> Observation:
+        await chunk("abcd")
+        await chunk("abcd", size=2)
+        await chunk("abcd", 3)
+        return use(Observation)
+
+    root = await pipeline()
+    assert runs == [2, 3]
+    assert [child.cache_status for child in root.children] == ["miss", "hit", "miss"]
+
+
+async def test_concurrent_calls_share_one_execution():
+    runs = 0
+
+    @observe(memo=Memo())
+    async def slow(x: int) -> int:
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    assert await asyncio.gather(*(slow(1) for _ in range(5))) == [2] * 5
+    assert runs == 1
+
+
+async def test_errors_are_not_memoized():
+    attempts = 0
+
+    @observe(memo=Memo())
+    async def flaky() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ValueError("first call fails")
+        return "ok"
+
+    with pytest.raises(ValueError):
+        await flaky()
+    assert await flaky() == "ok"
+    assert await flaky() == "ok"
+    assert attempts == 2
+
+
+async def test_custom_encoders_and_persistent_tier(tmp_path):
+    runs: list[str] = []
+
+    def make_task(memo: Memo):
+        @observe(memo=memo)
+        async def embed(document: Document) -> list[float]:
+            runs.append(document.id)
+            return [float(len(document.text))]
+
+        return embed
+
+    path = tmp_path / "memo.db"
+    encoders = {Document: lambda document: document.id}
+    embed = make_task(Memo(persist=ResponseCache(path), encoders=encoders))
+    assert await embed(Document(id="a", text="hello")) == [5.0]
+    # keyed by id only, so edited text is not a new key
+    assert await embed(Document(id="a", text="changed")) == [5.0]
+
+    restarted = make_task(Memo(persist=ResponseCache(path), encoders=encoders))
+    assert await restarted(Document(id="a", text="hello")) == [5.0]
+    assert runs == ["a"]
+
+
+async def test_unhashable_arguments_run_every_time():
+    runs = 0
+
+    @observe(memo=Memo())
+    async def use_object(value: object) -> None:
+        nonlocal runs
+        runs += 1
+
+    marker = object()
+    await use_object(marker)
+    await use_object(marker)
+    assert runs == 2
@@ -74,3 +74,15 @@ async def test_nested_mocks():
         with provide(mocks=[mock_x1000]):
             assert await multiply(2, 3) == 6000
         assert await multiply(2, 3) == 600
+
+
+async def test_mock_miss_falls_through_to_real_function():
+    @ev.mock(multiply)
+    async def mock_small_only(x: int, y: int) -> int:
+        if x > 10:
+            raise ev.MockMiss()
+        return -1
+
+    with provide(mocks=[mock_small_only]):
+        assert await multiply(2, 3) == -1
+        assert await multiply(20, 3) == 60
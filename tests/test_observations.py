@@ -1,4 +1,4 @@
-from agentlens.client import Observation, observe, use
+from agentlens.client import Observation, TraceStore, observe, provide, use
 
 
 @observe
@@ -79,3 +79,86 @@ async def test_access_observation_self():
 
     obs_id = await some_task()
     assert obs_id is not None
+
+
+async def test_observation_timestamps():
+    obs = await top_level_task()
+    assert isinstance(obs.id, int)
+    assert obs.end_ns is not None and obs.end_ns >= obs.start_ns
+    assert obs.end_time is not None and obs.end_time >= obs.start_time
+
+
+async def test_trace_store_evicts_completed_subtrees():
+    @observe
+    async def step():
+        return use(Observation)
+
+    @observe
+    async def loop():
+        for _ in range(10):
+            await step()
+        return use(Observation)
+
+    store = TraceStore(max_nodes=3)
+    with provide(store):
+        root = await loop()
+    assert [c.name for c in root.children] == ["step"] * 3
+    assert store.size == 3 and store.evicted == 7
+
+
+async def test_trace_store_releases_dropped_roots():
+    @observe
+    async def step():
+        return use(Observation)
+
+    @observe
+    async def root_task():
+        for _ in range(3):
+            await step()
+        return len(use(Observation).children)
+
+    store = TraceStore(max_nodes=5)
+    with provide(store):
+        linked = [await root_task() for _ in range(6)]
+    # each root is dropped before the next one starts, so its nodes no longer count
+    assert linked == [3] * 6
+    assert store.size == 0
+
+
+async def test_trace_store_eviction_queue_stays_bounded():
+    @observe
+    async def step():
+        pass
+
+    @observe
+    async def root_task():
+        for _ in range(5):
+            await step()
+
+    store = TraceStore(max_nodes=10)
+    with provide(store):
+        for _ in range(200):
+            await root_task()
+    assert store.size == 0
+    assert len(store._completed) <= 2 * store.max_nodes
+
+
+async def test_trace_store_max_depth():
+    @observe
+    async def leaf():
+        return use(Observation)
+
+    @observe
+    async def middle():
+        return await leaf()
+
+    @observe
+    async def root_task():
+        leaf_obs = await middle()
+        return use(Observation), leaf_obs
+
+    with provide(TraceStore(max_depth=1)):
+        root, leaf_obs = await root_task()
+    assert [c.name for c in root.children] == ["middle"]
+    assert root.children[0].children == []
+    assert leaf_obs.depth == 2 and leaf_obs.parent is None
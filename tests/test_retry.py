@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from agentlens.client import Observation, observe, provide, use
+from agentlens.inference import generate_text
+from agentlens.retry import RetryBudget, RetryPolicy, is_retryable, retry_after_seconds
+from agentlens.testing import FakeProvider
+
+
+class Response:
+    def __init__(self, status_code: int, headers: dict[str, str] | None = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class APIError(Exception):
+    def __init__(self, status_code: int, headers: dict[str, str] | None = None):
+        super().__init__(f"status {status_code}")
+        self.response = Response(status_code, headers)
+
+
+def fast_policy(**kwargs) -> RetryPolicy:
+    return RetryPolicy(backoff_min=0.001, backoff_max=0.01, **kwargs)
+
+
+def test_error_classification():
+    assert is_retryable(APIError(429))
+    assert is_retryable(APIError(503))
+    assert is_retryable(ConnectionError())
+    assert not is_retryable(APIError(401))
+    assert not is_retryable(NotImplementedError())
+
+
+def test_retry_after_hints():
+    assert retry_after_seconds(APIError(429, {"retry-after": "7"})) == 7
+    assert retry_after_seconds(APIError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(APIError(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert retry_after_seconds(APIError(500)) is None
+    assert fast_policy().delay(1, APIError(429, {"retry-after": "0.005"})) == 0.005
+    # hints are capped at the policy's maximum backoff
+    assert fast_policy().delay(1, APIError(429, {"retry-after": "60"})) == 0.01
+
+
+def test_retry_budget_limits_retry_ratio():
+    budget = RetryBudget(ratio=0.25, min_retries_per_second=0, max_balance=1)
+    assert budget.try_retry()
+    assert not budget.try_retry()
+    for _ in range(4):
+        budget.record_request()
+    assert budget.try_retry()
+    assert budget.rejected == 1
+
+
+async def test_generate_retries_transient_errors():
+    provider = FakeProvider(failures=2)
+
+    @observe
+    async def ask():
+        await generate_text(provider / "m", prompt="hello")
+        return use(Observation)
+
+    with provide(fast_policy(budget=None)):
+        root = await ask()
+    assert provider.calls == 3
+    assert root.children[0].retries == 2
+
+
+async def test_fatal_errors_and_exhausted_budget_stop_retries():
+    class FatalProvider(FakeProvider):
+        async def generate_text(self, **kwargs):
+            self.calls += 1
+            raise APIError(401)
+
+    provider = FatalProvider()
+    with provide(fast_policy(budget=None)), pytest.raises(APIError):
+        await generate_text(provider / "m", prompt="hello")
+    assert provider.calls == 1
+
+    flaky = FakeProvider(failures=100)
+    empty = RetryBudget(min_retries_per_second=0, max_balance=0)
+    with provide(fast_policy(budget=empty)), pytest.raises(ConnectionError):
+        await generate_text(flaky / "m", prompt="hello")
+    assert flaky.calls == 1 and empty.rejected == 1
+
+
+async def test_slot_is_released_during_backoff():
+    provider = FakeProvider(failures=1, max_connections_default=1, adaptive_concurrency=False)
+    policy = RetryPolicy(backoff_min=0.2, backoff_max=0.2, budget=None)
+
+    async def retrying():
+        await generate_text(provider / "m", prompt="retry me")
+
+    async def concurrent():
+        await asyncio.sleep(0.12)
+        start = time.monotonic()
+        # same provider and pool: only completes quickly if the backoff freed the slot
+        provider.failures = 0
+        await generate_text(provider / "m", prompt="other")
+        return time.monotonic() - start
+
+    with provide(policy):
+        _, elapsed = await asyncio.gather(retrying(), concurrent())
+    assert elapsed < 0.2
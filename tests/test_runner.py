@@ -0,0 +1,78 @@
+import json
+import textwrap
+
+import pytest
+from typer.testing import CliRunner
+
+from agentlens.cli import app
+from agentlens.runner import load_dataset, run_dataset
+
+EVAL_MODULE = textwrap.dedent(
+    """
+    import os
+
+    import agentlens.evaluation as ev
+    from agentlens.client import observe
+
+
+    @observe
+    async def solve(question: str) -> dict:
+        if question == "fail":
+            raise ValueError("cannot solve")
+        return {"answer": question.upper(), "pid": os.getpid()}
+
+
+    @ev.hook(solve)
+    def shout(question: str) -> ev.Hook[dict]:
+        yield {"question": question + "!"}
+    """
+)
+
+
+@pytest.fixture
+def eval_module(tmp_path, monkeypatch):
+    (tmp_path / "eval_module.py").write_text(EVAL_MODULE)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return "eval_module.py"
+
+
+def test_run_dataset_shards_across_workers_and_merges_results(eval_module):
+    streamed: list[int] = []
+    inputs = [{"question": q} for q in ("a", "b", "fail", "c")]
+
+    report = run_dataset(
+        eval_module,
+        "solve",
+        inputs,
+        workers=2,
+        hooks=["shout"],
+        on_result=lambda result: streamed.append(result.index),
+    )
+
+    assert sorted(streamed) == [0, 1, 2, 3]
+    assert [r.index for r in report.results] == [0, 1, 2, 3]
+    assert report.results[0].output["answer"] == "A!"
+    assert report.results[2].output["answer"] == "FAIL!"  # the hook applies in every worker
+    assert report.errors == 0
+    assert {r.worker for r in report.results} == {0, 1}
+    assert report.summary()["items"] == 4
+
+
+def test_cli_runs_dataset_and_writes_report(eval_module, tmp_path):
+    dataset = tmp_path / "inputs.jsonl"
+    dataset.write_text('{"question": "x"}\n{"question": "fail"}\n')
+    assert load_dataset(dataset) == [{"question": "x"}, {"question": "fail"}]
+
+    result = CliRunner().invoke(
+        app,
+        ["run", eval_module, "solve", "--dataset", str(dataset), "--workers", "2"]
+        + ["--report", str(tmp_path / "report.json")],
+    )
+
+    assert result.exit_code == 1  # one item failed
+    assert "[1] error" in result.output
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["summary"]["errors"] == 1
+    assert report["results"][0]["output"]["answer"] == "X"
+    assert "cannot solve" in report["results"][1]["error"]
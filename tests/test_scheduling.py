@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+
+from agentlens.client import provide
+from agentlens.inference import generate_text
+from agentlens.limits import AdaptiveLimiter
+from agentlens.scheduling import FairQueue, Priority
+from agentlens.testing import FakeProvider
+
+
+def test_higher_levels_are_served_first():
+    queue: FairQueue[str] = FairQueue()
+    queue.push("background", Priority(level=-1))
+    queue.push("normal", Priority())
+    queue.push("interactive", Priority(level=1))
+    assert [queue.pop() for _ in range(3)] == ["interactive", "normal", "background"]
+    assert not queue
+
+
+def test_tenants_share_a_level_by_weight():
+    queue: FairQueue[str] = FairQueue()
+    for i in range(6):
+        queue.push(f"a{i}", Priority(tenant="a", weight=2))
+    for i in range(3):
+        queue.push(f"b{i}", Priority(tenant="b"))
+
+    served = [queue.pop()[0] for _ in range(6)]
+    # the backlog of tenant a does not delay b beyond its share
+    assert served.count("a") == 4 and served.count("b") == 2
+
+
+def test_starved_waiters_are_promoted():
+    queue: FairQueue[str] = FairQueue(starvation_timeout=0.01)
+    queue.push("old", Priority(level=-1))
+    time.sleep(0.02)
+    queue.push("new", Priority(level=1))
+    assert queue.pop() == "old"
+    assert queue.stats[-1].promoted == 1
+
+
+def test_removed_waiters_are_skipped():
+    queue: FairQueue[str] = FairQueue()
+    queue.push("a", Priority())
+    queue.push("b", Priority())
+    queue.remove("a")
+    assert "a" not in queue
+    assert queue.pop() == "b"
+    with pytest.raises(IndexError):
+        queue.pop()
+
+
+@pytest.mark.parametrize("starvation_timeout", [None, 60.0])
+def test_removed_waiters_do_not_accumulate(starvation_timeout):
+    queue: FairQueue[int] = FairQueue(starvation_timeout=starvation_timeout)
+    queue.push(-1, Priority())
+    for i in range(1000):
+        queue.push(i, Priority())
+        queue.remove(i)
+    level = queue._levels[0]
+    assert len(level.heap) <= 2
+    assert len(level.arrivals) <= 2
+    assert queue.pop() == -1
+
+
+async def test_limiter_admits_waiters_by_priority_and_records_stats():
+    limiter = AdaptiveLimiter(max_limit=1)
+    order: list[int] = []
+
+    async def call(level: int):
+        async with limiter.slot(Priority(level=level)):
+            order.append(level)
+            await asyncio.sleep(0.001)
+
+    await limiter.acquire()
+    tasks = [asyncio.create_task(call(level)) for level in (0, -1, 2, 1)]
+    await asyncio.sleep(0)
+    assert limiter.waiting == 4
+    assert limiter.stats[0].depth == 1
+    limiter.release()
+    await asyncio.gather(*tasks)
+
+    assert order == [2, 1, 0, -1]
+    assert limiter.stats[-1].wait.count == 1
+    assert limiter.stats[0].admitted == 2  # including the slot taken without waiting
+
+
+async def test_priority_is_inherited_from_context_or_set_per_call():
+    provider = FakeProvider(max_connections_default=1)
+    limiter = provider.get_semaphore("m")
+    order: list[str] = []
+
+    async def call(prompt: str, priority: Priority | None = None):
+        order.append(await generate_text(provider / "m", prompt=prompt, priority=priority))
+
+    async def background():
+        with provide(Priority(level=-1)):
+            await call("background")
+
+    await limiter.acquire()
+    calls = asyncio.gather(background(), call("normal"), call("interactive", Priority(level=1)))
+    while limiter.waiting < 3:
+        await asyncio.sleep(0.01)
+    limiter.release()
+    await calls
+    assert order == ["interactive", "normal", "background"]
@@ -1,6 +1,7 @@
 import pytest
 
-from agentlens.client import observe
+import agentlens.evaluation as ev
+from agentlens.client import observe, provide
 
 
 @observe
@@ -62,3 +63,33 @@ async def test_nested_tasks():
     c_result = await child_task()
     assert p_result == "parent"
     assert c_result == "child"
+
+
+@observe
+async def varargs_task(*values: int, scale: int = 1) -> int:
+    return sum(values) * scale
+
+
+async def test_task_with_varargs():
+    assert await varargs_task(1, 2, 3) == 6
+    assert await varargs_task(1, 2, scale=10) == 30
+
+
+async def test_task_with_varargs_under_hooks_and_mocks():
+    @ev.hook()
+    def passthrough(*args, **kwargs) -> ev.Hook[int]:
+        yield None
+
+    @ev.hook(varargs_task)
+    def double(scale: int) -> ev.Hook[int]:
+        yield {"scale": scale * 2}
+
+    with provide(hooks=[passthrough, double]):
+        assert await varargs_task(1, 2, 3) == 12
+
+    @ev.mock(varargs_task)
+    async def product(*values: int, scale: int = 1) -> int:
+        return values[0] * values[1] * scale
+
+    with provide(mocks=[product]):
+        assert await varargs_task(2, 5, scale=3) == 30